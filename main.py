@@ -10,10 +10,20 @@ Date: 2025-10-19
 """
 
 import asyncio
+import heapq
 import sys
 import os
 from datetime import datetime
-from typing import Optional, Tuple
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import uvloop  # Optional: libuv-backed event loop, much faster socket reads on Linux
+except ImportError:
+    uvloop = None
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
@@ -34,9 +44,13 @@ def validate_date(date_str: str) -> bool:
     Returns:
         True if valid, False otherwise
     """
+    # Cheap reject first: strptime's %d accepts "01" or "1", so a 1st must end in one of them
+    if not date_str.endswith(("-01", "-1")):
+        return False
+    
     try:
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        return date_obj.day == 1
+        datetime.strptime(date_str, "%Y-%m-%d")
+        return True
     except ValueError:
         return False
 
@@ -115,19 +129,44 @@ async def download_and_process_data(date: str) -> bool:
     """
     Download and process data for the given date.
     
+    Downloads run concurrently and each file is processed as soon as it
+    arrives, so parsing overlaps with the remaining transfers.
+    
     Args:
         date: Date string in YYYY-MM-DD format
         
     Returns:
         True if successful, False otherwise
     """
-    print(f"\n📥 DOWNLOADING DATA FOR {date}")
+    print(f"\n📥 DOWNLOADING AND PROCESSING DATA FOR {date}")
     print("=" * 50)
     
     try:
-        # Download data
         downloader = DataDownloader(date=date)
-        files = await downloader.download_all_data(duration_minutes=1440)
+        processor = DataProcessor(data_dir=f"data/{date}")
+        queue = asyncio.Queue()
+        processed_data = {}
+        
+        async def download():
+            try:
+                return await downloader.download_all_data(duration_minutes=1440, queue=queue)
+            finally:
+                # Sentinel: no more files are coming
+                queue.put_nowait(None)
+        
+        async def process():
+            while (filepath := await queue.get()) is not None:
+                # Parse in a worker thread while the remaining downloads keep streaming
+                df = await asyncio.to_thread(processor.process_file, filepath)
+                if df is not None:
+                    processed_data[filepath] = df
+        
+        # Process each file as soon as it lands instead of after the last download
+        async with asyncio.TaskGroup() as tg:
+            download_task = tg.create_task(download())
+            tg.create_task(process())
+        
+        files = download_task.result()
         
         if not files:
             print("❌ No data downloaded!")
@@ -135,13 +174,6 @@ async def download_and_process_data(date: str) -> bool:
             
         print(f"✅ Downloaded {len(files)} files")
         
-        # Process data
-        print(f"\n🔄 PROCESSING DATA")
-        print("=" * 50)
-        
-        processor = DataProcessor(data_dir=f"data/{date}")
-        processed_data = processor.process_all_data()
-        
         if not processed_data:
             print("❌ No data processed!")
             return False
@@ -154,6 +186,49 @@ async def download_and_process_data(date: str) -> bool:
         return False
 
 
+def save_opportunities(
+    opportunities: Iterable[Dict],
+    path: str,
+    chunk_size: int = 10_000,
+    top_n: int = 5
+) -> Tuple[int, List[Dict]]:
+    """
+    Write opportunities to a Parquet file in fixed-size batches.
+    
+    Args:
+        opportunities: Opportunity dicts, e.g. from iter_arbitrage_opportunities
+        path: Output Parquet file (not created when there are no opportunities)
+        chunk_size: Rows per record batch
+        top_n: Number of best opportunities to keep for the report
+        
+    Returns:
+        Tuple of (total opportunities written, top_n best opportunities)
+    """
+    opportunities = iter(opportunities)
+    writer = None
+    total = 0
+    top = []
+    
+    try:
+        while True:
+            chunk = list(islice(opportunities, chunk_size))
+            if not chunk:
+                break
+            
+            batch = pa.RecordBatch.from_pylist(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression='zstd')
+            writer.write_batch(batch)
+            
+            total += len(chunk)
+            top = heapq.nlargest(top_n, top + chunk, key=lambda x: x['risk_adjusted_percentage'])
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    return total, top
+
+
 def detect_arbitrage(date: str, latency_risk: float, arbitrage_type: int) -> bool:
     """
     Detect arbitrage opportunities based on type.
@@ -181,25 +256,24 @@ def detect_arbitrage(date: str, latency_risk: float, arbitrage_type: int) -> boo
                 print("❌ No processed data found!")
                 return False
             
-            # Find opportunities
-            opportunities = detector.find_arbitrage_opportunities(data)
+            # Save results
+            results_dir = f"results/{date}"
+            os.makedirs(results_dir, exist_ok=True)
+            
+            # Stream opportunities to Parquet, keeping only the top hits for the report
+            total, top = save_opportunities(
+                detector.iter_arbitrage_opportunities(data),
+                f"{results_dir}/regular_arbitrage_opportunities.parquet"
+            )
             
             # Analyze performance
             performance = detector.analyze_exchange_performance(data)
             
             # Generate report
-            report = detector.generate_report(opportunities, performance)
+            report = detector.generate_report(top, performance, total_opportunities=total)
             print(report)
             
-            # Save results
-            results_dir = f"results/{date}"
-            os.makedirs(results_dir, exist_ok=True)
-            
-            # Save opportunities to CSV
-            if opportunities:
-                import pandas as pd
-                df = pd.DataFrame(opportunities)
-                df.to_csv(f"{results_dir}/regular_arbitrage_opportunities.csv", index=False)
+            if total:
                 print(f"\n💾 Results saved to: {results_dir}/")
             
             return True
@@ -292,4 +366,11 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop.install() is deprecated; pass the loop factory, or set the policy before 3.12
+    if uvloop is None:
+        asyncio.run(main())
+    elif sys.version_info >= (3, 12):
+        asyncio.run(main(), loop_factory=uvloop.new_event_loop)
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(main())
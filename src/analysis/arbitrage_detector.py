@@ -11,14 +11,120 @@ Date: 2025-10-19
 import pandas as pd
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Optional, Union
 import logging
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Processed CSV reads keep only the columns detection needs, typed up front
+CSV_READ_OPTIONS = pacsv.ReadOptions(use_threads=True)
+CSV_CONVERT_OPTIONS = pacsv.ConvertOptions(
+    include_columns=['timestamp', 'price'],
+    column_types={'timestamp': pa.timestamp('ns'), 'price': pa.float32()}
+)
+
+# Record layout for detected opportunities (one field per report column)
+OPPORTUNITY_DTYPE = np.dtype([
+    ('timestamp', 'M8[ns]'),
+    ('buy_exchange', 'U16'),
+    ('sell_exchange', 'U16'),
+    ('symbol', 'U16'),
+    ('buy_price', 'f8'),
+    ('sell_price', 'f8'),
+    ('gross_profit_percentage', 'f8'),
+    ('risk_adjusted_percentage', 'f8'),
+    ('absolute_profit', 'f8'),
+    ('is_profitable', '?'),
+    ('quantity', 'f8'),
+])
+
+
+def _directional_profits(
+    prices: np.ndarray,
+    taker: np.ndarray,
+    latency_risk: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute profit for buying on exchange i and selling on exchange j.
+    
+    Works on any leading shape; the last axis of prices is the exchange.
+    Only the two [..., E, E] outputs are allocated, the scaling is done in
+    place, so large price cubes don't pay for intermediate temporaries.
+    
+    Args:
+        prices: Price array with exchanges on the last axis
+        taker: Taker fee per exchange
+        latency_risk: Latency risk factor (0.0 to 1.0)
+        
+    Returns:
+        Tuple of (buy_cost [..., E], gross_profit [..., E, E],
+        risk_adjusted_percentage [..., E, E]); self-pairs are NaN
+    """
+    buy_cost = prices * (1 + taker)
+    sell_revenue = prices * (1 - taker)
+    
+    gross_profit = np.subtract(sell_revenue[..., None, :], buy_cost[..., :, None])
+    risk_pct = np.divide(gross_profit, buy_cost[..., :, None])
+    risk_pct *= (1 - latency_risk) * 100
+    
+    # Mask self-pairs; NaN prices never compare greater than the threshold
+    diagonal = np.arange(prices.shape[-1])
+    risk_pct[..., diagonal, diagonal] = np.nan
+    
+    return buy_cost, gross_profit, risk_pct
+
+
+def _compile_directional_kernel(taker: List[float]) -> Callable:
+    """
+    Generate a straight-line version of _directional_profits for fixed fees.
+    
+    The exchange count and fees are known once the detector is built, so the
+    kernel is emitted as source with one line per (buy, sell) pair and the fee
+    factors baked in as literals: no broadcasting setup, no fee array, and
+    each pair is written straight into its slot of the output arrays.
+    
+    Args:
+        taker: Taker fee per exchange, in output order
+        
+    Returns:
+        kernel(prices, scale) -> (buy_cost, gross_profit, risk_pct), matching
+        _directional_profits with scale = (1 - latency_risk) * 100
+    """
+    n = len(taker)
+    lines = [
+        "def kernel(prices, scale):",
+        "    buy_cost = np.empty_like(prices)",
+        "    sell_revenue = np.empty_like(prices)",
+    ]
+    for e, fee in enumerate(taker):
+        lines.append(f"    np.multiply(prices[..., {e}], {1 + fee!r}, out=buy_cost[..., {e}])")
+        lines.append(f"    np.multiply(prices[..., {e}], {1 - fee!r}, out=sell_revenue[..., {e}])")
+    lines.append(f"    gross_profit = np.empty(prices.shape + ({n},), dtype=prices.dtype)")
+    lines.append("    risk_pct = np.empty_like(gross_profit)")
+    for i in range(n):
+        for j in range(n):
+            lines.append(
+                f"    np.subtract(sell_revenue[..., {j}], buy_cost[..., {i}], out=gross_profit[..., {i}, {j}])"
+            )
+            if i == j:
+                lines.append(f"    risk_pct[..., {i}, {j}] = np.nan")
+            else:
+                lines.append(
+                    f"    np.divide(gross_profit[..., {i}, {j}], buy_cost[..., {i}], out=risk_pct[..., {i}, {j}])"
+                )
+    lines.append("    risk_pct *= scale")
+    lines.append("    return buy_cost, gross_profit, risk_pct")
+    
+    namespace = {}
+    exec("\n".join(lines), {"np": np}, namespace)
+    return namespace["kernel"]
+
 
 class ArbitrageDetector:
     """
@@ -33,6 +139,14 @@ class ArbitrageDetector:
         min_profit_threshold: Minimum profit percentage to consider
     """
     
+    # Exchange symbol -> canonical crypto, one hash lookup per symbol
+    ALIAS = {
+        'btcusdt': 'btc', 'btc_usd': 'btc', 'xbt_usd': 'btc',
+        'ethusdt': 'eth', 'eth_usd': 'eth',
+        'solusdt': 'sol', 'sol_usd': 'sol'
+    }
+    CRYPTOS = ('btc', 'eth', 'sol')
+    
     def __init__(self, latency_risk: float = 0.1):
         """
         Initialize the ArbitrageDetector.
@@ -51,6 +165,10 @@ class ArbitrageDetector:
             "kraken": {"maker": 0.0016, "taker": 0.0026}   # 0.16% / 0.26%
         }
         
+        # Taker fee array and unrolled kernel, rebuilt whenever fee_rates changes
+        self._fee_signature = None
+        self._refresh_fee_tables()
+        
         # Minimum profit threshold (percentage)
         self.min_profit_threshold = 0.01  # 1%
         
@@ -72,30 +190,121 @@ class ArbitrageDetector:
         exchanges = ["binance", "coinbase", "kraken"]
         all_data = {}
         
+        # Collect every file first so the reads can overlap
+        jobs = []
         for exchange in exchanges:
             exchange_dir = f"{processed_dir}/{exchange}"
-            exchange_data = {}
+            all_data[exchange] = {}
             
             try:
-                for filename in os.listdir(exchange_dir):
-                    if filename.endswith('.csv'):
-                        symbol = filename.replace('.csv', '')
-                        filepath = f"{exchange_dir}/{filename}"
-                        
-                        df = pd.read_csv(filepath)
-                        df['timestamp'] = pd.to_datetime(df['timestamp'])
-                        exchange_data[symbol] = df
-                        
-                        logger.info(f"✅ Loaded {exchange}/{symbol}: {len(df)} records")
-                
-                all_data[exchange] = exchange_data
+                files = {}
+                with os.scandir(exchange_dir) as entries:
+                    for entry in entries:
+                        if not entry.is_file():
+                            continue
+                        symbol, ext = os.path.splitext(entry.name)
+                        if ext in ('.csv', '.parquet'):
+                            files.setdefault(symbol, {})[ext] = entry.path
                 
+                # Prefer the Parquet copy: typed columnar decode instead of text parsing
+                for symbol, paths in files.items():
+                    if '.parquet' in paths:
+                        jobs.append((exchange, symbol, self._read_parquet, paths['.parquet']))
+                    else:
+                        jobs.append((exchange, symbol, self._read_csv, paths['.csv']))
             except FileNotFoundError:
                 logger.error(f"❌ Processed data not found for {exchange} at {exchange_dir}")
-                all_data[exchange] = {}
+        
+        # Parsing happens in C and releases the GIL, so threads overlap disk and parse time;
+        # results are inserted in job order, keeping the symbol order stable between runs
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            frames = executor.map(lambda job: job[2](job[3]), jobs)
+            for (exchange, symbol, _, _), df in zip(jobs, frames):
+                all_data[exchange][symbol] = df
+                
+                logger.info(f"✅ Loaded {exchange}/{symbol}: {len(df)} records")
         
         return all_data
     
+    @staticmethod
+    def _downcast(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Shrink loaded data to float32 prices and second-resolution timestamps.
+        
+        Detection works on 1-second buckets and percentage spreads, so neither
+        sub-second timestamps nor float64 price precision change the result,
+        while halving the bytes every downstream pass has to move.
+        """
+        df['price'] = df['price'].astype(np.float32)
+        df['timestamp'] = df['timestamp'].astype('datetime64[s]')
+        return df
+    
+    @classmethod
+    def _read_csv(cls, filepath: str) -> pd.DataFrame:
+        """Read the columns needed for detection from a processed CSV file with Arrow's multithreaded parser."""
+        df = pacsv.read_csv(
+            filepath,
+            read_options=CSV_READ_OPTIONS,
+            convert_options=CSV_CONVERT_OPTIONS
+        ).to_pandas()
+        return cls._downcast(df)
+    
+    @classmethod
+    def _read_parquet(cls, filepath: str) -> pd.DataFrame:
+        """Read the columns needed for detection from a processed Parquet file."""
+        df = pd.read_parquet(filepath, columns=['timestamp', 'price'], engine='pyarrow')
+        return cls._downcast(df)
+    
+    def _refresh_fee_tables(self):
+        """
+        Rebuild the taker fee array and the unrolled kernel if fee_rates changed.
+        
+        fee_rates is public and may be edited after construction, so the
+        derived tables are checked against the current taker fees on every
+        lookup; the check is one small tuple, the rebuild only runs on change.
+        """
+        signature = tuple(
+            (exchange, rates.get("taker", 0.001)) for exchange, rates in self.fee_rates.items()
+        )
+        if signature == self._fee_signature:
+            return
+        
+        # Taker fees as an array indexed by exchange position
+        self._fee_signature = signature
+        self._exch_idx = {exchange: i for i, (exchange, _) in enumerate(signature)}
+        self._taker = np.array([taker for _, taker in signature], dtype=np.float64)
+        
+        # Unrolled profit kernel for the configured exchanges, in fee_rates order
+        self._kernel_exchanges = tuple(self._exch_idx)
+        self._kernel = _compile_directional_kernel(self._taker.tolist())
+    
+    def _taker_fees(self, exchanges: List[str]) -> np.ndarray:
+        """
+        Look up taker fees for a list of exchanges, for the price cube kernels.
+        
+        Args:
+            exchanges: Exchange names
+            
+        Returns:
+            Array of taker fee rates; unknown exchanges get the 0.1% default
+        """
+        self._refresh_fee_tables()
+        idx = np.array([self._exch_idx.get(exchange, -1) for exchange in exchanges], dtype=np.intp)
+        return np.where(idx >= 0, self._taker[idx], 0.001)
+    
+    def _taker_fee(self, exchange: str) -> float:
+        """
+        Look up the taker fee of one exchange.
+        
+        Args:
+            exchange: Exchange name
+            
+        Returns:
+            Taker fee rate; unknown exchanges get the 0.1% default
+        """
+        # Two dict lookups on the live settings; the fee array only pays off for the cube
+        return self.fee_rates.get(exchange, {}).get("taker", 0.001)
+    
     def calculate_arbitrage_opportunity(
         self, 
         buy_exchange: str, 
@@ -120,8 +329,8 @@ class ArbitrageDetector:
             Dictionary with arbitrage calculations
         """
         # Get fee rates
-        buy_fee_rate = self.fee_rates.get(buy_exchange, {}).get("taker", 0.001)
-        sell_fee_rate = self.fee_rates.get(sell_exchange, {}).get("taker", 0.001)
+        buy_fee_rate = self._taker_fee(buy_exchange)
+        sell_fee_rate = self._taker_fee(sell_exchange)
         
         # Calculate costs
         buy_cost = buy_price * (1 + buy_fee_rate)
@@ -151,134 +360,250 @@ class ArbitrageDetector:
             "quantity": quantity
         }
     
-    def find_arbitrage_opportunities(
-        self, 
-        data: Dict[str, Dict[str, pd.DataFrame]]
-    ) -> List[Dict[str, float]]:
+    @staticmethod
+    def to_tidy_frame(data: Dict[str, Dict[str, pd.DataFrame]]) -> pd.DataFrame:
         """
-        Find all arbitrage opportunities across exchanges.
+        Flatten exchange -> symbol -> DataFrame data into one tidy frame.
         
         Args:
             data: Processed data from all exchanges
             
         Returns:
-            List of arbitrage opportunities
+            DataFrame with columns [timestamp, exchange, symbol, price],
+            sorted by timestamp
+        """
+        frames = {
+            (exchange, symbol): df[['timestamp', 'price']]
+            for exchange, exchange_data in data.items()
+            for symbol, df in exchange_data.items()
+        }
+        if not frames:
+            return pd.DataFrame({
+                'timestamp': pd.Series(dtype='datetime64[ns]'),
+                'exchange': pd.Series(dtype=object),
+                'symbol': pd.Series(dtype=object),
+                'price': pd.Series(dtype=np.float64)
+            })
+        
+        tidy = pd.concat(frames, names=['exchange', 'symbol'])
+        tidy = tidy.reset_index(level=['exchange', 'symbol']).reset_index(drop=True)
+        tidy['timestamp'] = pd.to_datetime(tidy['timestamp'])
+        return tidy[['timestamp', 'exchange', 'symbol', 'price']].sort_values(
+            'timestamp', kind='stable', ignore_index=True
+        )
+    
+    def _build_price_cube(
+        self,
+        tidy: pd.DataFrame,
+        exchanges: List[str]
+    ) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """
+        Align every (crypto, exchange) price series onto a common timeline.
+        
+        Timestamps are floored to 1 second, the union of all of them forms the
+        grid, and each series is forward-filled onto it so that every row holds
+        the last known price per exchange at that moment.
+        
+        Args:
+            tidy: Tidy price frame (see to_tidy_frame)
+            exchanges: Exchanges to include, in output order
+            
+        Returns:
+            Tuple of (timeline, prices) where prices has shape
+            [time, crypto, exchange] (cryptos in CRYPTOS order) and is NaN
+            before an exchange's first trade
+        """
+        cryptos = list(self.CRYPTOS)
+        
+        frame = tidy.assign(
+            crypto=tidy['symbol'].map(self.ALIAS),
+            timestamp=tidy['timestamp'].dt.floor('s')
+        ).dropna(subset=['crypto'])
+        
+        if frame.empty:
+            return pd.DatetimeIndex([]), np.empty((0, len(cryptos), len(exchanges)), dtype=np.float32)
+        
+        # Last trade per second for each (crypto, exchange), one column each
+        wide = frame.groupby(['timestamp', 'crypto', 'exchange'])['price'].last()
+        wide = wide.unstack(['crypto', 'exchange'])
+        wide = wide.reindex(columns=pd.MultiIndex.from_product([cryptos, exchanges])).ffill()
+        
+        prices = wide.to_numpy(dtype=np.float32).reshape(len(wide), len(cryptos), len(exchanges))
+        return pd.DatetimeIndex(wide.index), prices
+    
+    def _opportunity_records(
+        self,
+        data: Union[Dict[str, Dict[str, pd.DataFrame]], pd.DataFrame]
+    ) -> np.ndarray:
+        """
+        Evaluate every timestamp and collect the winners as a record array.
+        
+        Args:
+            data: Processed data from all exchanges, either as loaded by
+                  load_processed_data or already flattened by to_tidy_frame
+            
+        Returns:
+            Structured array with OPPORTUNITY_DTYPE, one row per opportunity,
+            sorted by risk_adjusted_percentage (highest first)
+        """
+        if isinstance(data, pd.DataFrame):
+            tidy = data
+            exchanges = list(tidy['exchange'].unique())
+        else:
+            tidy = self.to_tidy_frame(data)
+            exchanges = list(data.keys())
+        
+        timeline, prices = self._build_price_cube(tidy, exchanges)
+        
+        # Common case: exactly the configured exchanges, handled by the unrolled kernel
+        self._refresh_fee_tables()
+        if tuple(exchanges) == self._kernel_exchanges:
+            buy_cost, gross_profit, risk_pct = self._kernel(prices, (1 - self.latency_risk) * 100)
+        else:
+            taker = self._taker_fees(exchanges).astype(prices.dtype)
+            buy_cost, gross_profit, risk_pct = _directional_profits(prices, taker, self.latency_risk)
+        
+        # Fill one column-oriented record array for all winners instead of a dict per hit
+        t, c, i, j = np.nonzero(risk_pct > self.min_profit_threshold)
+        records = np.empty(len(t), dtype=OPPORTUNITY_DTYPE)
+        records['timestamp'] = timeline.to_numpy()[t]
+        records['buy_exchange'] = np.asarray(exchanges, dtype=str)[i]
+        records['sell_exchange'] = np.asarray(exchanges, dtype=str)[j]
+        records['symbol'] = np.asarray([f"{crypto}_usd" for crypto in self.CRYPTOS], dtype=str)[c]
+        records['buy_price'] = prices[t, c, i]
+        records['sell_price'] = prices[t, c, j]
+        records['gross_profit_percentage'] = gross_profit[t, c, i, j] / buy_cost[t, c, i] * 100
+        records['risk_adjusted_percentage'] = risk_pct[t, c, i, j]
+        records['absolute_profit'] = gross_profit[t, c, i, j] * (1 - self.latency_risk)
+        records['is_profitable'] = True
+        records['quantity'] = 1.0
+        
+        # Most profitable first; one C-level stable sort, ties stay in timeline order
+        order = np.argsort(-records['risk_adjusted_percentage'], kind='stable')
+        return records[order]
+    
+    def iter_arbitrage_opportunities(
+        self,
+        data: Union[Dict[str, Dict[str, pd.DataFrame]], pd.DataFrame],
+        chunk_size: int = 10_000
+    ) -> Iterator[Dict[str, float]]:
+        """
+        Yield arbitrage opportunities one at a time, most profitable first.
+        
+        Only chunk_size opportunity dicts exist at once, so callers that
+        stream results to disk never hold the full list in memory.
+        
+        Args:
+            data: Processed data from all exchanges (see find_arbitrage_opportunities)
+            chunk_size: Number of records converted to dicts per step
+            
+        Yields:
+            Arbitrage opportunity dicts
         """
         logger.info("🔍 Searching for arbitrage opportunities...")
         
-        opportunities = []
-        exchanges = list(data.keys())
+        records = self._opportunity_records(data)
         
-        # Symbol mapping for different exchanges
-        symbol_mapping = {
-            'btc': ['btcusdt', 'btc_usd', 'xbt_usd'],
-            'eth': ['ethusdt', 'eth_usd', 'eth_usd'],
-            'sol': ['solusdt', 'sol_usd', 'sol_usd']
-        }
+        for start in range(0, len(records), chunk_size):
+            chunk = pd.DataFrame.from_records(records[start:start + chunk_size]).to_dict('records')
+            
+            # Per-hit detail is formatted only when debug logging is on; the report shows the top hits
+            if logger.isEnabledFor(logging.DEBUG):
+                for opp in chunk:
+                    logger.debug(
+                        "    ✅ Opportunity: %s → %s (%s) %.2f%%",
+                        opp['buy_exchange'], opp['sell_exchange'], opp['symbol'],
+                        opp['risk_adjusted_percentage']
+                    )
+            
+            yield from chunk
         
-        # Compare all pairs of exchanges
-        for i, exchange1 in enumerate(exchanges):
-            for j, exchange2 in enumerate(exchanges):
-                if i >= j:  # Avoid duplicate comparisons
-                    continue
-                
-                logger.info(f"Comparing {exchange1} vs {exchange2}")
-                
-                # Check each cryptocurrency
-                for crypto, symbols in symbol_mapping.items():
-                    symbol1 = None
-                    symbol2 = None
-                    
-                    # Find matching symbols in each exchange
-                    for symbol in symbols:
-                        if symbol in data[exchange1]:
-                            symbol1 = symbol
-                        if symbol in data[exchange2]:
-                            symbol2 = symbol
-                    
-                    if symbol1 and symbol2:
-                        df1 = data[exchange1][symbol1]
-                        df2 = data[exchange2][symbol2]
-                        
-                        if len(df1) == 0 or len(df2) == 0:
-                            continue
-                        
-                        # Get latest prices
-                        latest_price1 = df1['price'].iloc[-1]
-                        latest_price2 = df2['price'].iloc[-1]
-                        
-                        logger.info(f"  {crypto}: {exchange1}({symbol1})=${latest_price1:.2f}, {exchange2}({symbol2})=${latest_price2:.2f}")
-                        
-                        # Check both directions
-                        opp1 = self.calculate_arbitrage_opportunity(
-                            exchange1, exchange2, f"{crypto}_usd", latest_price1, latest_price2
-                        )
-                        opp2 = self.calculate_arbitrage_opportunity(
-                            exchange2, exchange1, f"{crypto}_usd", latest_price2, latest_price1
-                        )
-                        
-                        if opp1['is_profitable']:
-                            opportunities.append(opp1)
-                            logger.info(f"    ✅ Opportunity: {opp1['risk_adjusted_percentage']:.2f}%")
-                            print(f"🎯 ARBITRAGE FOUND!")
-                            print(f"   {opp1['buy_exchange']} → {opp1['sell_exchange']} ({opp1['symbol']})")
-                            print(f"   Buy: ${opp1['buy_price']:.2f} → Sell: ${opp1['sell_price']:.2f}")
-                            print(f"   Gross Profit: {opp1['gross_profit_percentage']:.2f}%")
-                            print(f"   Net Profit: {opp1['risk_adjusted_percentage']:.2f}%")
-                            print(f"   Absolute Profit: ${opp1['absolute_profit']:.2f}")
-                            print()
-                        if opp2['is_profitable']:
-                            opportunities.append(opp2)
-                            logger.info(f"    ✅ Opportunity: {opp2['risk_adjusted_percentage']:.2f}%")
-                            print(f"🎯 ARBITRAGE FOUND!")
-                            print(f"   {opp2['buy_exchange']} → {opp2['sell_exchange']} ({opp2['symbol']})")
-                            print(f"   Buy: ${opp2['buy_price']:.2f} → Sell: ${opp2['sell_price']:.2f}")
-                            print(f"   Gross Profit: {opp2['gross_profit_percentage']:.2f}%")
-                            print(f"   Net Profit: {opp2['risk_adjusted_percentage']:.2f}%")
-                            print(f"   Absolute Profit: ${opp2['absolute_profit']:.2f}")
-                            print()
-        
-        # Sort by profitability
-        opportunities.sort(key=lambda x: x['risk_adjusted_percentage'], reverse=True)
-        
-        logger.info(f"✅ Found {len(opportunities)} arbitrage opportunities")
-        return opportunities
-    
-    def analyze_exchange_performance(self, data: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, Dict]:
+        logger.info(f"✅ Found {len(records)} arbitrage opportunities")
+    
+    def find_arbitrage_opportunities(
+        self, 
+        data: Union[Dict[str, Dict[str, pd.DataFrame]], pd.DataFrame]
+    ) -> List[Dict[str, float]]:
+        """
+        Find all arbitrage opportunities across exchanges.
+        
+        Every timestamp of the trading day is evaluated, comparing the last
+        known price on each exchange at that moment.
+        
+        Args:
+            data: Processed data from all exchanges, either as loaded by
+                  load_processed_data or already flattened by to_tidy_frame
+            
+        Returns:
+            List of arbitrage opportunities
+        """
+        # Already sorted by profitability
+        return list(self.iter_arbitrage_opportunities(data))
+    
+    def analyze_exchange_performance(
+        self,
+        data: Union[Dict[str, Dict[str, pd.DataFrame]], pd.DataFrame]
+    ) -> Dict[str, Dict]:
         """
         Analyze which exchanges are leading/lagging in price discovery.
         
         Args:
-            data: Processed data from all exchanges
+            data: Processed data from all exchanges, either as loaded by
+                  load_processed_data or already flattened by to_tidy_frame
             
         Returns:
             Dictionary with exchange performance analysis
         """
         logger.info("📊 Analyzing exchange performance...")
         
-        analysis = {}
-        exchanges = list(data.keys())
+        if isinstance(data, pd.DataFrame):
+            tidy = data
+            layout = {
+                exchange: list(symbols.unique())
+                for exchange, symbols in tidy.groupby('exchange', sort=False)['symbol']
+            }
+        else:
+            tidy = self.to_tidy_frame(data)
+            layout = {exchange: list(exchange_data.keys()) for exchange, exchange_data in data.items()}
         
-        for exchange in exchanges:
-            exchange_data = data[exchange]
-            total_trades = sum(len(df) for df in exchange_data.values())
-            avg_price = np.mean([df['price'].mean() for df in exchange_data.values()])
+        # One groupby over the whole frame instead of a Python pass per symbol
+        # Prices may be stored as float32; accumulate means in float64
+        stats = tidy['price'].astype(np.float64).groupby(
+            [tidy['exchange'], tidy['symbol']], sort=False
+        ).agg(['size', 'mean'])
+        
+        analysis = {}
+        for exchange, symbols in layout.items():
+            if exchange in stats.index.get_level_values('exchange'):
+                exchange_stats = stats.xs(exchange, level='exchange')
+                total_trades = int(exchange_stats['size'].sum())
+                avg_price = exchange_stats['mean'].mean()
+            else:
+                total_trades = 0
+                avg_price = np.nan
             
             analysis[exchange] = {
                 "total_trades": total_trades,
                 "avg_price": avg_price,
-                "symbols": list(exchange_data.keys())
+                "symbols": symbols
             }
         
         return analysis
     
-    def generate_report(self, opportunities: List[Dict], performance: Dict) -> str:
+    def generate_report(
+        self,
+        opportunities: List[Dict],
+        performance: Dict,
+        total_opportunities: Optional[int] = None
+    ) -> str:
         """
         Generate comprehensive arbitrage report.
         
         Args:
-            opportunities: List of arbitrage opportunities
+            opportunities: List of arbitrage opportunities, best first
             performance: Exchange performance analysis
+            total_opportunities: Overall count when opportunities holds only
+                                 the top hits (defaults to its length)
             
         Returns:
             Formatted report string
@@ -288,9 +613,12 @@ class ArbitrageDetector:
         report.append("🎯 ARBITRAGE DETECTION REPORT")
         report.append("=" * 60)
         
+        if total_opportunities is None:
+            total_opportunities = len(opportunities)
+        
         # Summary
         report.append(f"\n📊 SUMMARY:")
-        report.append(f"   Total Opportunities: {len(opportunities)}")
+        report.append(f"   Total Opportunities: {total_opportunities}")
         report.append(f"   Latency Risk Factor: {self.latency_risk}")
         report.append(f"   Min Profit Threshold: {self.min_profit_threshold}%")
         
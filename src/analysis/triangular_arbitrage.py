@@ -14,11 +14,42 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import logging
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Processed CSV column types, so no second parsing pass is needed after the read
+CSV_READ_OPTIONS = pacsv.ReadOptions(use_threads=True)
+CSV_CONVERT_OPTIONS = pacsv.ConvertOptions(column_types={
+    'timestamp': pa.timestamp('ns'),
+    'price': pa.float64(),
+    'quantity': pa.float64()
+})
+
+
+def _read_processed_file(filepath: str) -> pd.DataFrame:
+    """
+    Read a processed Parquet or CSV file.
+    
+    Args:
+        filepath: Path to the processed file
+        
+    Returns:
+        DataFrame with typed timestamp/price/quantity columns
+    """
+    if filepath.endswith('.parquet'):
+        return pd.read_parquet(filepath)
+    
+    # Arrow parses the typed columns in one multithreaded pass
+    return pacsv.read_csv(
+        filepath,
+        read_options=CSV_READ_OPTIONS,
+        convert_options=CSV_CONVERT_OPTIONS
+    ).to_pandas()
+
 
 class TriangularArbitrageDetector:
     """
@@ -38,6 +69,17 @@ class TriangularArbitrageDetector:
         min_profit_threshold: Minimum profit percentage to consider
     """
     
+    # Symbol names used by each exchange for every crypto
+    SYMBOL_MAPPING = {
+        'btc': ('btcusdt', 'btc_usd', 'xbt_usd'),
+        'eth': ('ethusdt', 'eth_usd'),
+        'sol': ('solusdt', 'sol_usd')
+    }
+    
+    # Inverted once: exchange symbol -> canonical crypto / "<crypto>_usd" price key
+    ALIAS = {symbol: crypto for crypto, symbols in SYMBOL_MAPPING.items() for symbol in symbols}
+    PRICE_KEYS = {symbol: f"{crypto}_usd" for symbol, crypto in ALIAS.items()}
+    
     def __init__(self, latency_risk: float = 0.1):
         """
         Initialize the TriangularArbitrageDetector.
@@ -89,16 +131,22 @@ class TriangularArbitrageDetector:
             exchange_data = {}
             
             try:
-                for filename in os.listdir(exchange_dir):
-                    if filename.endswith('.csv'):
-                        symbol = filename.replace('.csv', '')
-                        filepath = f"{exchange_dir}/{filename}"
-                        
-                        df = pd.read_csv(filepath)
-                        df['timestamp'] = pd.to_datetime(df['timestamp'])
-                        exchange_data[symbol] = df
-                        
-                        logger.info(f"✅ Loaded {exchange}/{symbol}: {len(df)} records")
+                files = {}
+                with os.scandir(exchange_dir) as entries:
+                    for entry in entries:
+                        if not entry.is_file():
+                            continue
+                        symbol, ext = os.path.splitext(entry.name)
+                        if ext in ('.csv', '.parquet'):
+                            files.setdefault(symbol, {})[ext] = entry
+                
+                for symbol, found in files.items():
+                    # Parquet is what DataProcessor writes; CSV remains for older directories
+                    entry = found.get('.parquet') or found['.csv']
+                    df = _read_processed_file(entry.path)
+                    exchange_data[symbol] = df
+                    
+                    logger.info(f"✅ Loaded {exchange}/{symbol}: {len(df)} records")
                 
                 all_data[exchange] = exchange_data
                 
@@ -160,22 +208,76 @@ class TriangularArbitrageDetector:
         net_profit = profit_percentage - total_fee_impact
         risk_adjusted_profit = net_profit * (1 - self.latency_risk)
         
+        return self._triangular_record(
+            exchange, path, profit_percentage, total_fee_impact, net_profit,
+            risk_adjusted_profit, (rate_a_to_b, rate_b_to_c, rate_c_to_a)
+        )
+    
+    def _triangular_record(
+        self,
+        exchange: str,
+        path: List[str],
+        gross_profit: float,
+        fee_impact: float,
+        net_profit: float,
+        risk_adjusted_profit: float,
+        rates: Tuple[float, float, float]
+    ) -> Dict[str, float]:
+        """
+        Build the opportunity dictionary for one exchange and path.
+        
+        Args:
+            exchange: Exchange name
+            path: List of cryptocurrencies in order [A, B, C]
+            gross_profit: Gross profit percentage
+            fee_impact: Fee impact percentage for the three trades
+            net_profit: Profit percentage after fees
+            risk_adjusted_profit: Net profit after latency risk
+            rates: Exchange rates for A->B, B->C and C->A
+            
+        Returns:
+            Dictionary with arbitrage calculations
+        """
+        crypto_a, crypto_b, crypto_c = path
+        risk_adjusted_profit = float(risk_adjusted_profit)
+        
         return {
             "exchange": exchange,
             "path": path,
             "start_crypto": crypto_a,
-            "gross_profit_percentage": profit_percentage,
-            "fee_impact": total_fee_impact,
-            "net_profit_percentage": net_profit,
+            "gross_profit_percentage": float(gross_profit),
+            "fee_impact": float(fee_impact),
+            "net_profit_percentage": float(net_profit),
             "risk_adjusted_percentage": risk_adjusted_profit,
             "is_profitable": risk_adjusted_profit > self.min_profit_threshold,
             "rates": {
-                f"{crypto_a}_to_{crypto_b}": rate_a_to_b,
-                f"{crypto_b}_to_{crypto_c}": rate_b_to_c,
-                f"{crypto_c}_to_{crypto_a}": rate_c_to_a
+                f"{crypto_a}_to_{crypto_b}": float(rates[0]),
+                f"{crypto_b}_to_{crypto_c}": float(rates[1]),
+                f"{crypto_c}_to_{crypto_a}": float(rates[2])
             }
         }
     
+    def _latest_prices(self, data: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, Dict[str, float]]:
+        """
+        Collect the last traded price per exchange and crypto in one pass.
+        
+        Args:
+            data: Processed data from all exchanges
+            
+        Returns:
+            Dictionary of exchange -> "<crypto>_usd" -> latest price
+        """
+        latest = {}
+        for exchange, exchange_data in data.items():
+            prices = {}
+            for symbol, df in exchange_data.items():
+                key = self.PRICE_KEYS.get(symbol)
+                if key is not None and key not in prices and len(df) > 0:
+                    # Read straight from the backing array, no Series/iloc machinery
+                    prices[key] = float(df['price'].to_numpy()[-1])
+            latest[exchange] = prices
+        return latest
+    
     def find_triangular_opportunities(
         self, 
         data: Dict[str, Dict[str, pd.DataFrame]]
@@ -191,59 +293,92 @@ class TriangularArbitrageDetector:
         """
         logger.info("🔍 Searching for triangular arbitrage opportunities...")
         
-        opportunities = []
-        exchanges = list(data.keys())
+        latest = self._latest_prices(data)
         
-        # Symbol mapping for different exchanges
-        symbol_mapping = {
-            'btc': ['btcusdt', 'btc_usd', 'xbt_usd'],
-            'eth': ['ethusdt', 'eth_usd', 'eth_usd'],
-            'sol': ['solusdt', 'sol_usd', 'sol_usd']
-        }
+        # Each path leg indexes into a per-crypto price column
+        paths = [path for path in self.triangular_paths if len(path) == 3]
+        cryptos = list(dict.fromkeys(crypto for path in paths for crypto in path))
+        legs = np.array(
+            [[cryptos.index(crypto) for crypto in path] for path in paths], dtype=np.intp
+        ).reshape(-1, 3)
         
-        for exchange in exchanges:
+        # Only exchanges with a price for every crypto can be evaluated
+        exchanges = []
+        for exchange in data:
             logger.info(f"Analyzing {exchange} for triangular arbitrage...")
-            
-            # Get current prices for this exchange
-            prices = {}
-            for crypto, symbols in symbol_mapping.items():
-                for symbol in symbols:
-                    if symbol in data[exchange] and len(data[exchange][symbol]) > 0:
-                        latest_price = data[exchange][symbol]['price'].iloc[-1]
-                        prices[f"{crypto}_usd"] = latest_price
-                        break
-            
-            # Check if we have all required prices
-            required_prices = ['btc_usd', 'eth_usd', 'sol_usd']
-            if not all(price in prices for price in required_prices):
+            if all(f"{crypto}_usd" in latest[exchange] for crypto in cryptos):
+                exchanges.append(exchange)
+            else:
                 logger.warning(f"Missing prices for {exchange}")
-                continue
-            
-            # Test each triangular path
-            for path in self.triangular_paths:
-                opportunity = self.calculate_triangular_arbitrage(exchange, path, prices)
-                
-                if opportunity and opportunity['is_profitable']:
-                    opportunities.append(opportunity)
-                    logger.info(f"  ✅ Found triangular opportunity: {path} - {opportunity['risk_adjusted_percentage']:.2f}%")
-                    print(f"🔺 TRIANGULAR ARBITRAGE FOUND!")
-                    path_str = " → ".join(opportunity['path']) + " → " + opportunity['start_crypto']
-                    print(f"   {opportunity['exchange'].upper()}: {path_str}")
-                    print(f"   Gross Profit: {opportunity['gross_profit_percentage']:.2f}%")
-                    print(f"   Fee Impact: {opportunity['fee_impact']:.2f}%")
-                    print(f"   Net Profit: {opportunity['net_profit_percentage']:.2f}%")
-                    print(f"   Risk Adjusted: {opportunity['risk_adjusted_percentage']:.2f}%")
-                    print(f"   Exchange Rates:")
-                    for rate_name, rate_value in opportunity['rates'].items():
-                        print(f"     {rate_name}: {rate_value:.6f}")
-                    print()
-        
-        # Sort by profitability
-        opportunities.sort(key=lambda x: x['risk_adjusted_percentage'], reverse=True)
+        
+        prices = np.array(
+            [[latest[exchange][f"{crypto}_usd"] for crypto in cryptos] for exchange in exchanges],
+            dtype=np.float64
+        ).reshape(len(exchanges), len(cryptos))
+        taker = np.array(
+            [self.fee_rates.get(exchange, {}).get("taker", 0.001) for exchange in exchanges],
+            dtype=np.float64
+        )
+        
+        # All exchanges x paths at once: [exchange, path, leg] rates, product over the legs.
+        # Zero prices turn into NaN/inf and never pass the threshold.
+        price_a, price_b, price_c = (prices[:, legs[:, k]] for k in range(3))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.stack([price_a / price_b, price_b / price_c, price_c / price_a], axis=-1)
+            gross_profit = (rates.prod(axis=-1) - 1) * 100
+        fee_impact = 3 * taker * 100
+        net_profit = gross_profit - fee_impact[:, None]
+        risk_adjusted = net_profit * (1 - self.latency_risk)
+        
+        # Profitable cells stay in parallel arrays; ordering them is one argsort, best first
+        hit_exchange, hit_path = np.nonzero(risk_adjusted > self.min_profit_threshold)
+        hit_risk = risk_adjusted[hit_exchange, hit_path]
+        order = np.argsort(-hit_risk, kind='stable')
+        hit_exchange, hit_path = hit_exchange[order], hit_path[order]
+        
+        # Dicts are built once, already in report order
+        opportunities = [
+            self._triangular_record(
+                exchanges[e], paths[p], gross_profit[e, p], fee_impact[e],
+                net_profit[e, p], risk_adjusted[e, p], rates[e, p]
+            )
+            for e, p in zip(hit_exchange.tolist(), hit_path.tolist())
+        ]
+        
+        # One write for every finding instead of a print per line
+        if opportunities:
+            for opportunity in opportunities:
+                logger.info(f"  ✅ Found triangular opportunity: {opportunity['path']} - {opportunity['risk_adjusted_percentage']:.2f}%")
+            print("\n".join(self._format_opportunity(opportunity) for opportunity in opportunities))
         
         logger.info(f"✅ Found {len(opportunities)} triangular arbitrage opportunities")
         return opportunities
     
+    def _format_opportunity(self, opportunity: Dict) -> str:
+        """
+        Format a found opportunity as a console block.
+        
+        Args:
+            opportunity: Triangular arbitrage opportunity
+            
+        Returns:
+            Multi-line description ending with a blank line
+        """
+        path_str = " → ".join(opportunity['path']) + " → " + opportunity['start_crypto']
+        lines = [
+            f"🔺 TRIANGULAR ARBITRAGE FOUND!",
+            f"   {opportunity['exchange'].upper()}: {path_str}",
+            f"   Gross Profit: {opportunity['gross_profit_percentage']:.2f}%",
+            f"   Fee Impact: {opportunity['fee_impact']:.2f}%",
+            f"   Net Profit: {opportunity['net_profit_percentage']:.2f}%",
+            f"   Risk Adjusted: {opportunity['risk_adjusted_percentage']:.2f}%",
+            f"   Exchange Rates:"
+        ]
+        for rate_name, rate_value in opportunity['rates'].items():
+            lines.append(f"     {rate_name}: {rate_value:.6f}")
+        lines.append("")
+        return "\n".join(lines)
+    
     def analyze_triangular_performance(self, data: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, Dict]:
         """
         Analyze triangular arbitrage performance across exchanges.
@@ -257,21 +392,35 @@ class TriangularArbitrageDetector:
         logger.info("📊 Analyzing triangular arbitrage performance...")
         
         analysis = {}
-        exchanges = list(data.keys())
         
-        for exchange in exchanges:
-            exchange_data = data[exchange]
-            total_trades = sum(len(df) for df in exchange_data.values())
+        # One contiguous price array with a segment per non-empty (exchange, symbol)
+        segments = [
+            (exchange, symbol, df['price'].to_numpy(dtype=np.float64))
+            for exchange, exchange_data in data.items()
+            for symbol, df in exchange_data.items()
+            if len(df) > 0
+        ]
+        
+        avg_prices = {exchange: {} for exchange in data}
+        if segments:
+            values = np.concatenate([prices for _, _, prices in segments])
+            lengths = np.array([len(prices) for _, _, prices in segments])
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
             
-            # Calculate average prices
-            avg_prices = {}
-            for symbol, df in exchange_data.items():
-                if len(df) > 0:
-                    avg_prices[symbol] = df['price'].mean()
+            # Segment means in two reductions, skipping NaN like Series.mean
+            valid = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            counts = np.add.reduceat(valid, starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts
             
+            for (exchange, symbol, _), mean in zip(segments, means.tolist()):
+                avg_prices[exchange][symbol] = mean
+        
+        for exchange, exchange_data in data.items():
             analysis[exchange] = {
-                "total_trades": total_trades,
-                "avg_prices": avg_prices,
+                "total_trades": sum(len(df) for df in exchange_data.values()),
+                "avg_prices": avg_prices[exchange],
                 "symbols": list(exchange_data.keys())
             }
         
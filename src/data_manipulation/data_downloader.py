@@ -10,17 +10,136 @@ Date: 2025-10-19
 """
 
 import asyncio
-import pandas as pd
+import json
 from datetime import datetime, timedelta
 from tardis_client import TardisClient, Channel
 import os
+import sys
+import urllib.error
 from typing import List, Dict, Optional
 import logging
+from array import array
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import uvloop  # Optional: libuv-backed event loop, much faster socket reads on Linux
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson  # Optional: faster decoding of the replayed message lines
+except ImportError:
+    orjson = None
+
+# JSON module handed to tardis-client for decoding replayed messages
+REPLAY_JSON = orjson if orjson is not None else json
+
+# Exchanges, their symbols and trade channel names, in download order
+EXCHANGES = ("binance", "coinbase", "kraken")
+SYMBOLS = {
+    "binance": ("btcusdt", "ethusdt", "solusdt"),
+    "coinbase": ("BTC-USD", "ETH-USD", "SOL-USD"),
+    "kraken": ("XBT/USD", "ETH/USD", "SOL/USD")
+}
+CHANNEL_NAMES = {
+    "binance": "trade",
+    "coinbase": "match",
+    "kraken": "trade"
+}
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Column layout of downloaded trade files
+TRADE_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('exchange', pa.string()),
+    ('symbol', pa.string()),
+    ('price', pa.float64()),
+    ('quantity', pa.float64()),
+    ('side', pa.string()),
+    ('trade_id', pa.int64())
+])
+
+
+class TradeBuffer:
+    """
+    Column-wise buffer of trade rows for one download.
+    
+    Numeric columns live in typed arrays (8 bytes per value instead of a
+    boxed float inside a tuple) and are handed to Arrow without a
+    row-to-column transpose.
+    
+    Attributes:
+        exchange: Exchange every buffered trade belongs to
+    """
+    
+    def __init__(self, exchange: str):
+        """
+        Initialize an empty buffer.
+        
+        Args:
+            exchange: Exchange name written to every row
+        """
+        self.exchange = exchange
+        self.clear()
+    
+    def __len__(self) -> int:
+        return len(self.prices)
+    
+    def add(self, timestamp, symbol: str, price: float, quantity: float, side: str, trade_id: int):
+        """
+        Append one trade.
+        
+        Args:
+            timestamp: Local timestamp (datetime or ISO string)
+            symbol: Exchange symbol
+            price: Trade price
+            quantity: Trade quantity
+            side: "buy" or "sell"
+            trade_id: Exchange trade id
+        """
+        # Convert before appending so a bad value cannot leave the columns misaligned
+        price, quantity, trade_id = float(price), float(quantity), int(trade_id)
+        self.timestamps.append(timestamp)
+        self.symbols.append(symbol)
+        self.prices.append(price)
+        self.quantities.append(quantity)
+        self.sides.append(side)
+        self.trade_ids.append(trade_id)
+    
+    def to_record_batch(self) -> pa.RecordBatch:
+        """
+        Build an Arrow record batch from the buffered columns.
+        
+        Returns:
+            Record batch with TRADE_SCHEMA
+        """
+        # Timestamps may arrive as datetimes or ISO strings; both cast to the schema type
+        columns = [
+            pa.array(self.timestamps).cast(TRADE_SCHEMA.field('timestamp').type),
+            pa.repeat(self.exchange, len(self)),
+            pa.array(self.symbols, type=pa.string()),
+            pa.array(np.frombuffer(self.prices, dtype=np.float64)),
+            pa.array(np.frombuffer(self.quantities, dtype=np.float64)),
+            pa.array(self.sides, type=pa.string()),
+            pa.array(np.frombuffer(self.trade_ids, dtype=np.int64))
+        ]
+        return pa.record_batch(columns, schema=TRADE_SCHEMA)
+    
+    def clear(self):
+        """Drop all buffered rows, keeping the exchange."""
+        # Fresh arrays rather than in-place truncation: a written batch may still share their memory
+        self.timestamps = []
+        self.symbols = []
+        self.prices = array('d')
+        self.quantities = array('d')
+        self.sides = []
+        self.trade_ids = array('q')
+
 
 class DataDownloader:
     """
@@ -34,6 +153,9 @@ class DataDownloader:
         tardis_client: TardisClient instance for API communication
         date: Target date for data download (YYYY-MM-DD format)
         data_dir: Directory path for storing downloaded data
+        max_concurrent_downloads: Maximum number of replays running at once
+        max_retries: Retries for a rate-limited (HTTP 429) download
+        batch_size: Rows buffered per write while streaming a download
     """
     
     def __init__(self, date: str = "2025-10-01"):
@@ -48,20 +170,37 @@ class DataDownloader:
         self.data_dir = f"data/{date}"
         os.makedirs(self.data_dir, exist_ok=True)
         
-        # Exchange and symbol mappings
-        self.exchanges = ["binance", "coinbase", "kraken"]
-        self.symbols = {
-            "binance": ["btcusdt", "ethusdt", "solusdt"],
-            "coinbase": ["BTC-USD", "ETH-USD", "SOL-USD"],
-            "kraken": ["XBT/USD", "ETH/USD", "SOL/USD"]
-        }
+        # Replay window start, parsed once; end dates are cached per duration
+        self._start_time = datetime.fromisoformat(f"{date}T00:00:00")
+        self._end_dates: Dict[int, str] = {}
+        
+        # Exchange directories already created, so each download skips the makedirs syscall
+        self._created_dirs = set()
+        
+        # Exchange and symbol mappings, copied from the module defaults so they can be narrowed
+        self.exchanges = list(EXCHANGES)
+        self.symbols = {exchange: list(symbols) for exchange, symbols in SYMBOLS.items()}
         
         # Channel names for each exchange
-        self.channel_names = {
-            "binance": "trade",
-            "coinbase": "match", 
-            "kraken": "trade"
+        self.channel_names = dict(CHANNEL_NAMES)
+        
+        # Message parsers per exchange, bound once; they write straight into a TradeBuffer
+        self._appenders = {
+            "binance": self._append_binance_message,
+            "coinbase": self._append_coinbase_message,
+            "kraken": self._append_kraken_message
         }
+        
+        # Concurrent replay limit and retry budget for 429 (rate limited) responses
+        self.max_concurrent_downloads = 5
+        self.max_retries = 5
+        
+        # Rows buffered per record batch while streaming a download to disk
+        self.batch_size = 10_000
+        
+        # Built on first use, so the limit can be changed after construction
+        self._semaphore = None
+        self._semaphore_key = None
     
     async def download_exchange_data(
         self,
@@ -72,164 +211,242 @@ class DataDownloader:
         """
         Download data for a specific exchange and symbol.
         
+        Trades are parsed into column buffers and streamed to the Parquet file
+        one record batch of batch_size rows at a time, so memory use does not
+        grow with the length of the replay.
+        
         Args:
             exchange: Exchange name (binance, coinbase, kraken)
             symbol: Trading symbol (e.g., 'btcusdt', 'BTC-USD')
             duration_minutes: Duration of data to download in minutes
             
         Returns:
-            Path to saved CSV file if successful, None otherwise
+            Path to saved Parquet file if successful, None otherwise
         """
         logger.info(f"Downloading {exchange} {symbol} data for {self.date}...")
+        filename = self._trade_file_path(exchange, symbol)
         
         try:
             # Calculate time range
-            start_time = datetime.fromisoformat(f"{self.date}T00:00:00")
-            end_time = start_time + timedelta(minutes=duration_minutes)
-            end_date = end_time.strftime("%Y-%m-%dT%H:%M:%S")
+            end_date = self._end_date(duration_minutes)
             
             # Get appropriate channel name
             channel_name = self.channel_names.get(exchange, "trade")
             
-            # Fetch data from tardis.dev
-            messages = self.tardis_client.replay(
-                exchange=exchange,
-                from_date=self.date,
-                to_date=end_date,
-                filters=[Channel(name=channel_name, symbols=[symbol])],
-            )
+            # Resolve the message parser once rather than per message
+            append = self._appenders.get(exchange)
+            if append is None:
+                logger.warning(f"Unknown exchange: {exchange}")
+                return None
             
-            # Process and save data
-            data = []
-            async for local_timestamp, message in messages:
-                processed_data = self._process_message(exchange, message, local_timestamp)
-                if processed_data:
-                    data.append(processed_data)
+            # Fetch data from tardis.dev, with a bounded number of replays in flight
+            async with self._download_slots():
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        messages = self.tardis_client.replay(
+                            exchange=exchange,
+                            from_date=self.date,
+                            to_date=end_date,
+                            filters=[Channel(name=channel_name, symbols=[symbol])],
+                            json=REPLAY_JSON,
+                        )
+                        
+                        # Stream rows to disk in fixed-size batches instead of holding the whole day.
+                        # Batches are encoded and written on a worker thread so the event loop
+                        # keeps serving the other downloads meanwhile
+                        written = 0
+                        buffer = TradeBuffer(exchange)
+                        with self._open_trade_writer(filename) as writer:
+                            async for local_timestamp, message in messages:
+                                try:
+                                    append(message, local_timestamp, buffer)
+                                except Exception as e:
+                                    logger.error(f"Error processing {exchange} message: {e}")
+                                    continue
+                                if len(buffer) >= self.batch_size:
+                                    written += await asyncio.to_thread(self._write_trades, writer, buffer)
+                            written += await asyncio.to_thread(self._write_trades, writer, buffer)
+                        break
+                        
+                    except urllib.error.HTTPError as e:
+                        # Back off exponentially when throttled, give up on anything else
+                        if e.code != 429 or attempt == self.max_retries:
+                            raise
+                        delay = 2 ** attempt
+                        logger.warning(f"⏳ Rate limited on {exchange} {symbol}, retrying in {delay}s...")
+                        await asyncio.sleep(delay)
             
-            if data:
-                return self._save_data_to_csv(exchange, symbol, data)
+            if written:
+                logger.info(f"✅ Saved {written} records to {filename}")
+                return filename
             else:
+                os.remove(filename)
                 logger.warning(f"No data found for {exchange} {symbol}")
                 return None
                 
         except Exception as e:
             logger.error(f"Error downloading {exchange} {symbol}: {e}")
+            # Don't leave a partially streamed file behind for the processor
+            if os.path.exists(filename):
+                os.remove(filename)
             return None
     
-    def _process_message(self, exchange: str, message: dict, timestamp: str) -> Optional[dict]:
+    def _download_slots(self) -> asyncio.Semaphore:
         """
-        Process raw message from exchange into standardized format.
+        Semaphore bounding concurrent replays.
+        
+        Rebuilt whenever max_concurrent_downloads or the running event loop
+        changes, since asyncio primitives cannot be shared across loops.
         
-        Args:
-            exchange: Exchange name
-            message: Raw message from exchange
-            timestamp: Local timestamp
-            
         Returns:
-            Processed data dictionary or None if processing fails
+            Semaphore with max_concurrent_downloads slots
         """
-        try:
-            if exchange == "binance":
-                return self._process_binance_message(message, timestamp)
-            elif exchange == "coinbase":
-                return self._process_coinbase_message(message, timestamp)
-            elif exchange == "kraken":
-                return self._process_kraken_message(message, timestamp)
-            else:
-                logger.warning(f"Unknown exchange: {exchange}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error processing {exchange} message: {e}")
-            return None
+        key = (asyncio.get_running_loop(), self.max_concurrent_downloads)
+        if self._semaphore_key != key:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
+            self._semaphore_key = key
+        return self._semaphore
     
-    def _process_binance_message(self, message: dict, timestamp: str) -> dict:
-        """Process Binance message format."""
+    def _append_binance_message(self, message: dict, timestamp: str, buffer: TradeBuffer) -> bool:
+        """Append a Binance trade to the buffer; returns whether a trade was added."""
+        # Prices arrive as strings or numbers; TradeBuffer.add converts them once
         data = message.get("data", {})
-        return {
-            "timestamp": timestamp,
-            "exchange": "binance",
-            "symbol": data.get("s", ""),
-            "price": float(data.get("p", 0)),
-            "quantity": float(data.get("q", 0)),
-            "side": "buy" if not data.get("m", False) else "sell",
-            "trade_id": data.get("t", 0)
-        }
+        buffer.add(
+            timestamp,
+            data.get("s", ""),
+            data.get("p", 0),
+            data.get("q", 0),
+            "buy" if not data.get("m", False) else "sell",
+            data.get("t", 0)
+        )
+        return True
     
-    def _process_coinbase_message(self, message: dict, timestamp: str) -> dict:
-        """Process Coinbase message format."""
-        return {
-            "timestamp": timestamp,
-            "exchange": "coinbase",
-            "symbol": message.get("product_id", ""),
-            "price": float(message.get("price", 0)),
-            "quantity": float(message.get("size", 0)),
-            "side": message.get("side", ""),
-            "trade_id": message.get("trade_id", 0)
-        }
+    def _append_coinbase_message(self, message: dict, timestamp: str, buffer: TradeBuffer) -> bool:
+        """Append a Coinbase trade to the buffer; returns whether a trade was added."""
+        buffer.add(
+            timestamp,
+            message.get("product_id", ""),
+            message.get("price", 0),
+            message.get("size", 0),
+            message.get("side", ""),
+            message.get("trade_id", 0)
+        )
+        return True
     
-    def _process_kraken_message(self, message: dict, timestamp: str) -> dict:
-        """Process Kraken message format."""
+    def _append_kraken_message(self, message: list, timestamp: str, buffer: TradeBuffer) -> bool:
+        """Append a Kraken trade to the buffer; returns whether a trade was added."""
         # Kraken format: [channel_id, data, channel_name, pair]
         if len(message) >= 3 and isinstance(message[1], list):
             trade_data = message[1][0]  # First trade in the batch
-            return {
-                "timestamp": timestamp,
-                "exchange": "kraken",
-                "symbol": message[3] if len(message) > 3 else "",
-                "price": float(trade_data[0]),
-                "quantity": float(trade_data[1]),
-                "side": "buy" if trade_data[3] == "b" else "sell",
-                "trade_id": message[0]
-            }
-        return None
+            buffer.add(
+                timestamp,
+                message[3] if len(message) > 3 else "",
+                trade_data[0],
+                trade_data[1],
+                "buy" if trade_data[3] == "b" else "sell",
+                message[0]
+            )
+            return True
+        return False
+    
+    def _end_date(self, duration_minutes: int) -> str:
+        """
+        Format the replay end date for a download duration.
+        
+        Args:
+            duration_minutes: Duration of data to download in minutes
+        
+        Returns:
+            End of the replay window as YYYY-MM-DDTHH:MM:SS
+        """
+        end_date = self._end_dates.get(duration_minutes)
+        if end_date is None:
+            end_time = self._start_time + timedelta(minutes=duration_minutes)
+            end_date = self._end_dates[duration_minutes] = end_time.strftime("%Y-%m-%dT%H:%M:%S")
+        return end_date
     
-    def _save_data_to_csv(self, exchange: str, symbol: str, data: List[dict]) -> str:
+    def _trade_file_path(self, exchange: str, symbol: str) -> str:
         """
-        Save processed data to CSV file.
+        Build the Parquet path for a symbol, creating the exchange directory.
         
         Args:
             exchange: Exchange name
             symbol: Trading symbol
-            data: List of processed data records
             
         Returns:
-            Path to saved CSV file
+            Path to the Parquet file
         """
-        # Create exchange subdirectory
+        # Create exchange subdirectory, once per directory
         exchange_dir = f"{self.data_dir}/{exchange}"
-        os.makedirs(exchange_dir, exist_ok=True)
+        if exchange_dir not in self._created_dirs:
+            os.makedirs(exchange_dir, exist_ok=True)
+            self._created_dirs.add(exchange_dir)
         
         # Clean symbol name for filename
         clean_symbol = symbol.replace('/', '_').replace('-', '_').lower()
-        filename = f"{exchange_dir}/{clean_symbol}.csv"
+        return f"{exchange_dir}/{clean_symbol}.parquet"
+    
+    def _open_trade_writer(self, filename: str) -> pq.ParquetWriter:
+        """Open an incremental Parquet writer; every written batch becomes a row group."""
+        return pq.ParquetWriter(filename, TRADE_SCHEMA, compression='snappy')
+    
+    def _write_trades(self, writer: pq.ParquetWriter, buffer: TradeBuffer) -> int:
+        """
+        Flush buffered trades as one columnar record batch.
         
-        # Save to CSV
-        df = pd.DataFrame(data)
-        df.to_csv(filename, index=False)
+        Args:
+            writer: Open trade writer
+            buffer: Buffered trades, emptied after the write
+            
+        Returns:
+            Number of rows written
+        """
+        count = len(buffer)
+        if not count:
+            return 0
         
-        logger.info(f"✅ Saved {len(data)} records to {filename}")
-        return filename
+        writer.write_batch(buffer.to_record_batch())
+        buffer.clear()
+        return count
     
-    async def download_all_data(self, duration_minutes: int = 1440) -> List[str]:
+    async def download_all_data(
+        self,
+        duration_minutes: int = 1440,
+        queue: Optional[asyncio.Queue] = None
+    ) -> List[str]:
         """
-        Download data for all exchanges and symbols.
+        Download data for all exchanges and symbols concurrently.
         
         Args:
             duration_minutes: Duration of data to download in minutes
-            
+            queue: Optional queue that receives each file path as soon as
+                   its download finishes, so processing can start early
+        
         Returns:
-            List of paths to downloaded CSV files
+            List of paths to downloaded Parquet files, in exchange/symbol order
         """
-        downloaded_files = []
+        async def fetch(exchange: str, symbol: str) -> Optional[str]:
+            filename = await self.download_exchange_data(
+                exchange, symbol, duration_minutes
+            )
+            if filename and queue is not None:
+                await queue.put(filename)
+            return filename
         
-        for exchange in self.exchanges:
-            for symbol in self.symbols[exchange]:
-                filename = await self.download_exchange_data(
-                    exchange, symbol, duration_minutes
-                )
-                if filename:
-                    downloaded_files.append(filename)
+        # Independent network I/O: wall time is the slowest download, not the sum
+        pairs = [(exchange, symbol) for exchange in self.exchanges for symbol in self.symbols[exchange]]
+        results = await asyncio.gather(
+            *(fetch(exchange, symbol) for exchange, symbol in pairs),
+            return_exceptions=True
+        )
+        
+        # One failed download must not discard the others
+        downloaded_files = []
+        for (exchange, symbol), result in zip(pairs, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error downloading {exchange} {symbol}: {result}")
+            elif result:
+                downloaded_files.append(result)
         
         logger.info(f"📊 Downloaded {len(downloaded_files)} files total")
         return downloaded_files
@@ -256,20 +473,27 @@ async def main():
     print("\n📂 Directory structure:")
     print("data/2025-10-01/")
     print("├── binance/")
-    print("│   ├── btcusdt.csv")
-    print("│   ├── ethusdt.csv")
-    print("│   └── solusdt.csv")
+    print("│   ├── btcusdt.parquet")
+    print("│   ├── ethusdt.parquet")
+    print("│   └── solusdt.parquet")
     print("├── coinbase/")
-    print("│   ├── btc_usd.csv")
-    print("│   ├── eth_usd.csv")
-    print("│   └── sol_usd.csv")
+    print("│   ├── btc_usd.parquet")
+    print("│   ├── eth_usd.parquet")
+    print("│   └── sol_usd.parquet")
     print("└── kraken/")
-    print("    ├── xbt_usd.csv")
-    print("    ├── eth_usd.csv")
-    print("    └── sol_usd.csv")
+    print("    ├── xbt_usd.parquet")
+    print("    ├── eth_usd.parquet")
+    print("    └── sol_usd.parquet")
     
     return files
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop.install() is deprecated; pass the loop factory, or set the policy before 3.12
+    if uvloop is None:
+        asyncio.run(main())
+    elif sys.version_info >= (3, 12):
+        asyncio.run(main(), loop_factory=uvloop.new_event_loop)
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(main())
\ No newline at end of file
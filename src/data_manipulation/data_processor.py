@@ -13,9 +13,20 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from typing import Dict, List, Tuple, Optional
 import warnings
 import logging
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+try:
+    import numexpr  # Optional: evaluates the row filters in one multithreaded pass
+except ImportError:
+    numexpr = None
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
@@ -24,6 +35,126 @@ warnings.filterwarnings('ignore')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columns the detectors need from processed files
+PROCESSED_COLUMNS = ['timestamp', 'price', 'quantity', 'side']
+
+# Low-cardinality string columns, held as pandas categoricals after loading
+CATEGORY_COLUMNS = ['exchange', 'symbol', 'side']
+
+# Raw CSV column types, parsed by the multi-threaded Arrow reader instead of inferred
+CSV_READ_OPTIONS = pacsv.ReadOptions(use_threads=True, block_size=8 << 20)
+CSV_CONVERT_OPTIONS = pacsv.ConvertOptions(column_types={
+    'timestamp': pa.timestamp('ns'),
+    'exchange': pa.string(),
+    'symbol': pa.string(),
+    'price': pa.float64(),
+    'quantity': pa.float64(),
+    'side': pa.string()
+})
+
+# Processed CSV copies are serialized in large record batches
+CSV_WRITE_OPTIONS = pacsv.WriteOptions(batch_size=65536)
+
+
+def _row_mask(
+    price: np.ndarray,
+    quantity: np.ndarray,
+    complete: np.ndarray,
+    outliers: bool = True
+) -> np.ndarray:
+    """
+    Fused row filter for clean_data.
+    
+    Keeps complete rows with positive price and quantity whose price lies
+    within 3 standard deviations of the mean of those rows. With numexpr
+    installed each condition set is one fused, multithreaded expression;
+    otherwise comparisons are written into preallocated buffers, so only two
+    temporaries are allocated regardless of how many conditions are combined.
+    
+    Args:
+        price: Price column as float64 (NaN for missing)
+        quantity: Quantity column as float64 (NaN for missing)
+        complete: True where the row has no missing values
+        outliers: Whether to apply the 3 standard deviation cut
+    
+    Returns:
+        Boolean mask of rows to keep
+    """
+    if numexpr is not None:
+        mask = numexpr.evaluate(
+            '(price > 0) & (quantity > 0) & complete',
+            local_dict={'price': price, 'quantity': quantity, 'complete': complete}
+        )
+    else:
+        mask = np.greater(price, 0, out=np.empty(price.shape, dtype=bool))
+        scratch = np.greater(quantity, 0, out=np.empty(price.shape, dtype=bool))
+        mask &= scratch
+        mask &= complete
+    
+    if not outliers:
+        return mask
+    
+    # Two-pass mean/std: a one-pass sum of squares cancels badly at BTC price levels
+    kept_prices = price[mask]
+    if kept_prices.size > 1:
+        price_mean = kept_prices.mean()
+        price_std = kept_prices.std(ddof=1)
+        if price_std > 0:  # Avoid division by zero
+            if numexpr is not None:
+                mask = numexpr.evaluate(
+                    'mask & (abs(price - price_mean) <= limit)',
+                    local_dict={'mask': mask, 'price': price, 'price_mean': price_mean, 'limit': 3 * price_std}
+                )
+            else:
+                deviation = np.subtract(price, price_mean)
+                np.abs(deviation, out=deviation)
+                mask &= np.less_equal(deviation, 3 * price_std, out=scratch)
+    
+    return mask
+
+
+def _drop_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop fully duplicated rows, keeping the first occurrence.
+    
+    Identical rows share a timestamp, so the int64 timestamp column is
+    hashed first and the full-row comparison, which hashes every string
+    column, only runs on rows whose timestamp repeats.
+    
+    Args:
+        df: DataFrame to deduplicate
+    
+    Returns:
+        DataFrame without duplicated rows, in the original order
+    """
+    if 'timestamp' not in df.columns:
+        return df.drop_duplicates()
+    
+    candidates = np.flatnonzero(df['timestamp'].duplicated(keep=False).to_numpy())
+    if candidates.size == 0:
+        return df
+    
+    duplicated = np.zeros(len(df), dtype=bool)
+    duplicated[candidates] = df.iloc[candidates].duplicated().to_numpy()
+    return df.iloc[np.flatnonzero(~duplicated)]
+
+
+def _process_exchange_counts(processor: "DataProcessor", exchange: str) -> Dict[str, int]:
+    """
+    Process one exchange in a worker process and report its record counts.
+    
+    The processed frames are already written by process_exchange, so only
+    the counts travel back to the parent instead of pickled DataFrames.
+    
+    Args:
+        processor: Processor whose settings the worker uses
+        exchange: Exchange name to process
+    
+    Returns:
+        Dictionary of symbol -> processed record count
+    """
+    return {symbol: len(df) for symbol, df in processor.process_exchange(exchange).items()}
+
 
 class DataProcessor:
     """
@@ -35,29 +166,45 @@ class DataProcessor:
     Attributes:
         data_dir: Directory containing raw data files
         processed_dir: Directory for storing processed data
+        csv_copy: Whether processed data is also saved as CSV next to the Parquet files
     """
     
-    def __init__(self, data_dir: str = "data/2025-10-01"):
+    # Raw downloads are Parquet; CSV is still accepted for older data directories
+    RAW_EXTENSIONS = ('.parquet', '.csv')
+    
+    def __init__(self, data_dir: str = "data/2025-10-01", csv_copy: bool = False):
         """
         Initialize the DataProcessor.
         
         Args:
             data_dir: Path to directory containing raw data files
+            csv_copy: Also save processed data as CSV, for humans and external tools
         """
         self.data_dir = data_dir
+        self.csv_copy = csv_copy
         # Extract date from data_dir (e.g., "data/2025-10-01" -> "2025-10-01")
         date_part = os.path.basename(data_dir)
         self.processed_dir = f"data/processed/{date_part}"
         os.makedirs(self.processed_dir, exist_ok=True)
         
+        # Processed exchange directories already created; process_file saves one symbol per call
+        self._created_dirs = set()
+        
         # Required columns for validation
         self.required_columns = [
             'timestamp', 'exchange', 'symbol', 'price', 'quantity', 'side'
         ]
+        self._required_set = frozenset(self.required_columns)
         
         # Price validation parameters
-        self.max_price = 1000000  # Maximum reasonable price
+        self.max_price = np.float64(1000000)  # Maximum reasonable price
         self.max_time_range = timedelta(hours=2)  # Maximum time range
+        
+        # Worker threads for per-symbol cleaning; pandas/NumPy kernels release the GIL
+        self.max_workers = min(8, os.cpu_count() or 1)
+        
+        # Rows per batch when streaming raw Parquet files
+        self.chunk_size = 250_000
     
     def load_exchange_data(self, exchange: str) -> Dict[str, pd.DataFrame]:
         """
@@ -69,25 +216,49 @@ class DataProcessor:
         Returns:
             Dictionary mapping symbol names to DataFrames
         """
+        return {symbol: df for symbol, (df, _) in self._load_exchange_files(exchange).items()}
+    
+    def _load_exchange_files(self, exchange: str) -> Dict[str, Tuple[pd.DataFrame, Dict]]:
+        """
+        Load all data files for a specific exchange with their read-time drop counts.
+        
+        Args:
+            exchange: Exchange name (binance, coinbase, kraken)
+        
+        Returns:
+            Dictionary mapping symbol names to (DataFrame, counts as returned by _read_raw_file)
+        """
         exchange_dir = f"{self.data_dir}/{exchange}"
         data = {}
         
-        if not os.path.exists(exchange_dir):
+        # DirEntry carries the file type from the directory read, no extra stat per file;
+        # a missing directory surfaces from scandir itself instead of a separate exists() call
+        try:
+            with os.scandir(exchange_dir) as entries:
+                files = [
+                    (*os.path.splitext(entry.name), entry.path)
+                    for entry in entries
+                    if entry.is_file() and entry.name.endswith(self.RAW_EXTENSIONS)
+                ]
+        except FileNotFoundError:
             logger.error(f"Exchange directory not found: {exchange_dir}")
             return data
-            
-        for filename in os.listdir(exchange_dir):
-            if filename.endswith('.csv'):
-                symbol = filename.replace('.csv', '')
-                filepath = f"{exchange_dir}/{filename}"
-                
-                try:
-                    df = pd.read_csv(filepath)
-                    data[symbol] = df
-                    logger.info(f"✅ Loaded {exchange}/{symbol}: {len(df)} records")
-                except Exception as e:
-                    logger.error(f"Error loading {exchange}/{symbol}: {e}")
-                    
+        
+        # One file per symbol, chosen before anything is read: Parquet wins over a legacy CSV
+        paths = {}
+        for symbol, ext, path in files:
+            if ext == '.parquet' or symbol not in paths:
+                paths[symbol] = path
+        
+        for symbol, path in paths.items():
+            try:
+                df, dropped = self._read_raw_file(path)
+                data[symbol] = df, dropped
+                logger.debug(f"✅ Loaded {exchange}/{symbol}: {len(df)} records")
+            except Exception as e:
+                logger.error(f"Error loading {exchange}/{symbol}: {e}")
+        
+        logger.info(f"✅ Loaded {len(data)} files for {exchange}")
         return data
     
     def clean_data(self, df: pd.DataFrame, exchange: str, symbol: str) -> pd.DataFrame:
@@ -102,42 +273,87 @@ class DataProcessor:
         Returns:
             Cleaned DataFrame
         """
-        logger.info(f"🧹 Cleaning {exchange}/{symbol}...")
+        return self._clean(df, exchange, symbol)[0]
+    
+    def _clean(
+        self,
+        df: pd.DataFrame,
+        exchange: str,
+        symbol: str,
+        dropped: Optional[Dict] = None
+    ) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Clean market data and summarize the result for validate_data.
+        
+        The price and time bounds fall out of arrays the cleaning pass
+        already holds, so validation does not have to scan the columns again.
+        
+        Args:
+            df: Raw DataFrame to clean
+            exchange: Exchange name for logging
+            symbol: Symbol name for logging
+            dropped: Rows already dropped while reading, as counted by _read_raw_file;
+                     added to the summary's row counts
+        
+        Returns:
+            Tuple of (cleaned DataFrame, summary with price_min/price_max,
+            time_min/time_max for non-empty frames and
+            duplicates/incomplete/filtered/records row counts)
+        """
+        logger.debug(f"🧹 Cleaning {exchange}/{symbol}...")
         initial_count = len(df)
         
         # Remove duplicates
-        df = df.drop_duplicates()
+        df = _drop_duplicates(df)
         duplicates_removed = initial_count - len(df)
         if duplicates_removed > 0:
-            logger.info(f"   Removed {duplicates_removed} duplicates")
-        
-        # Handle missing values
-        missing_before = df.isnull().sum().sum()
-        df = df.dropna()
-        if missing_before > 0:
-            logger.info(f"   Removed {missing_before} missing values")
-        
-        # Convert timestamp to datetime
+            logger.debug(f"   Removed {duplicates_removed} duplicates")
+        
+        # One boolean mask for every row filter: missing values, non-positive
+        # price/quantity and price outliers (more than 3 standard deviations from mean)
+        complete = df.notna().all(axis=1).to_numpy()
+        price = df['price'].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask = _row_mask(
+            price,
+            df['quantity'].to_numpy(dtype=np.float64, na_value=np.nan),
+            complete
+        )
+        kept = bool(mask.any())
+        summary = {
+            'price_min': np.min(price, where=mask, initial=np.inf) if kept else np.nan,
+            'price_max': np.max(price, where=mask, initial=-np.inf) if kept else np.nan
+        }
+        
+        incomplete = len(df) - np.count_nonzero(complete)
+        if incomplete > 0:
+            logger.debug(f"   Removed {incomplete} rows with missing values")
+        df = df.iloc[np.flatnonzero(mask)]
+        summary['duplicates'] = duplicates_removed
+        summary['incomplete'] = incomplete
+        summary['filtered'] = initial_count - duplicates_removed - incomplete - len(df)
+        summary['records'] = len(df)
+        for key, count in (dropped or {}).items():
+            summary[key] += count
+        
+        # Convert timestamp to datetime; files read through _read_raw_file are already typed
         if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
             df = df.sort_values('timestamp')
+            if len(df) > 0:
+                summary['time_min'] = df['timestamp'].iat[0]
+                summary['time_max'] = df['timestamp'].iat[-1]
         
-        # Remove invalid prices and quantities
-        df = df[df['price'] > 0]
-        df = df[df['quantity'] > 0]
-        
-        # Remove price outliers (more than 3 standard deviations from mean)
-        if len(df) > 0:
-            price_mean = df['price'].mean()
-            price_std = df['price'].std()
-            if price_std > 0:  # Avoid division by zero
-                df = df[abs(df['price'] - price_mean) <= 3 * price_std]
-        
-        final_count = len(df)
-        logger.info(f"   Final records: {final_count}")
-        return df
+        logger.debug(f"   Final records: {len(df)}")
+        return df, summary
     
-    def validate_data(self, df: pd.DataFrame, exchange: str, symbol: str) -> bool:
+    def validate_data(
+        self,
+        df: pd.DataFrame,
+        exchange: str,
+        symbol: str,
+        summary: Optional[Dict] = None
+    ) -> bool:
         """
         Validate data quality and structure.
         
@@ -145,16 +361,17 @@ class DataProcessor:
             df: DataFrame to validate
             exchange: Exchange name for logging
             symbol: Symbol name for logging
+            summary: Precomputed price/time bounds from cleaning; scanned from df if omitted
             
         Returns:
             True if data passes validation, False otherwise
         """
-        logger.info(f"🔍 Validating {exchange}/{symbol}...")
+        logger.debug(f"🔍 Validating {exchange}/{symbol}...")
         
         # Check required columns
-        missing_columns = [col for col in self.required_columns if col not in df.columns]
+        missing_columns = self._required_set.difference(df.columns)
         if missing_columns:
-            logger.error(f"   ❌ Missing columns: {missing_columns}")
+            logger.error(f"   ❌ Missing columns: {sorted(missing_columns)}")
             return False
         
         # Check data types
@@ -171,27 +388,47 @@ class DataProcessor:
             return False
         
         # Check for reasonable price ranges
-        if df['price'].min() <= 0:
-            logger.error(f"   ❌ Invalid prices found (<= 0)")
-            return False
+        if summary is None:
+            # One fused pass over the prices; the negated range also catches NaN
+            prices = df['price'].to_numpy(dtype=np.float64)
+            if not ((prices > 0) & (prices <= self.max_price)).all():
+                logger.error(f"   ❌ Invalid prices found (<= 0, missing or suspiciously high)")
+                return False
             
-        if df['price'].max() > self.max_price:
-            logger.error(f"   ❌ Suspiciously high prices found")
-            return False
+            if len(df) > 0:
+                timestamps = df['timestamp']
+                summary = {'time_min': timestamps.min(), 'time_max': timestamps.max()}
+            else:
+                summary = {}
+        else:
+            if summary['price_min'] <= 0:
+                logger.error(f"   ❌ Invalid prices found (<= 0)")
+                return False
+            
+            if summary['price_max'] > self.max_price:
+                logger.error(f"   ❌ Suspiciously high prices found")
+                return False
         
         # Check timestamp range
-        if len(df) > 0:
-            time_range = df['timestamp'].max() - df['timestamp'].min()
+        if 'time_min' in summary:
+            time_range = summary['time_max'] - summary['time_min']
             if time_range > self.max_time_range:
                 logger.warning(f"   ⚠️  Large time range: {time_range}")
         
-        logger.info(f"   ✅ Data validation passed")
+        logger.debug(f"   ✅ Data validation passed")
         return True
     
     def synchronize_time(self, exchange_data: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
         """
         Synchronize timestamps across all symbols in an exchange.
         
+        Frames are expected sorted by timestamp, as clean_data returns them,
+        so the time range comes from the first and last rows. The range spans
+        every symbol, so no row falls outside it and the frames are returned
+        as they are; only the range is logged. Rows are not aligned to each
+        other here; that happens once for all exchanges in
+        ArbitrageDetector._build_price_cube.
+        
         Args:
             exchange_data: Dictionary of symbol -> DataFrame mappings
             
@@ -200,32 +437,23 @@ class DataProcessor:
         """
         logger.info("🕐 Synchronizing timestamps...")
         
-        # Find common time range across all symbols
-        all_timestamps = []
-        for symbol, df in exchange_data.items():
-            if len(df) > 0:
-                all_timestamps.extend(df['timestamp'].tolist())
+        # Overall time range across all symbols, for the log
+        symbols = [symbol for symbol, df in exchange_data.items() if len(df) > 0]
         
-        if not all_timestamps:
+        if not symbols:
             logger.warning("No timestamps found for synchronization")
             return exchange_data
-            
-        min_time = min(all_timestamps)
-        max_time = max(all_timestamps)
+        
+        min_time = min(exchange_data[symbol]['timestamp'].iat[0] for symbol in symbols)
+        max_time = max(exchange_data[symbol]['timestamp'].iat[-1] for symbol in symbols)
         
         logger.info(f"   Time range: {min_time} to {max_time}")
         
-        # Filter all data to common time range
-        synchronized_data = {}
-        for symbol, df in exchange_data.items():
-            if len(df) > 0:
-                mask = (df['timestamp'] >= min_time) & (df['timestamp'] <= max_time)
-                synchronized_data[symbol] = df[mask].copy()
-                logger.info(f"   {symbol}: {len(synchronized_data[symbol])} records")
-            else:
-                synchronized_data[symbol] = df
+        # Every frame lies inside the range, so the cleaned frames are passed through
+        for symbol in symbols:
+            logger.debug(f"   {symbol}: {len(exchange_data[symbol])} records")
         
-        return synchronized_data
+        return dict(exchange_data)
     
     def process_exchange(self, exchange: str) -> Dict[str, pd.DataFrame]:
         """
@@ -241,19 +469,21 @@ class DataProcessor:
         logger.info("=" * 50)
         
         # Load raw data
-        raw_data = self.load_exchange_data(exchange)
+        raw_data = self._load_exchange_files(exchange)
         if not raw_data:
             logger.error(f"❌ No data found for {exchange}")
             return {}
         
-        # Clean and validate data
-        cleaned_data = {}
-        for symbol, df in raw_data.items():
-            cleaned_df = self.clean_data(df, exchange, symbol)
-            if self.validate_data(cleaned_df, exchange, symbol):
-                cleaned_data[symbol] = cleaned_df
-            else:
-                logger.error(f"❌ Validation failed for {exchange}/{symbol}")
+        def clean(symbol):
+            df, dropped = raw_data[symbol]
+            return self._clean_and_validate(df, exchange, symbol, dropped)
+        
+        # Clean and validate data; symbols are independent, so they run side by side
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(raw_data, executor.map(clean, raw_data)))
+        
+        cleaned_data = {symbol: df for symbol, (df, _) in results.items() if df is not None}
+        self._log_cleaning(exchange, [summary for _, summary in results.values()])
         
         # Synchronize timestamps
         synchronized_data = self.synchronize_time(cleaned_data)
@@ -263,38 +493,235 @@ class DataProcessor:
         
         return synchronized_data
     
+    def process_file(self, filepath: str) -> Optional[pd.DataFrame]:
+        """
+        Process a single raw data file as soon as it is available.
+        
+        The exchange and symbol are taken from the path layout written by
+        DataDownloader ({data_dir}/{exchange}/{symbol}.parquet).
+        
+        Args:
+            filepath: Path to a raw Parquet (or legacy CSV) file
+        
+        Returns:
+            Processed DataFrame, or None if loading or validation failed
+        """
+        exchange = os.path.basename(os.path.dirname(filepath))
+        symbol = os.path.splitext(os.path.basename(filepath))[0]
+        
+        try:
+            df, dropped = self._read_raw_file(filepath)
+        except Exception as e:
+            logger.error(f"Error loading {exchange}/{symbol}: {e}")
+            return None
+        
+        cleaned_df, summary = self._clean_and_validate(df, exchange, symbol, dropped)
+        self._log_cleaning(exchange, [summary])
+        if cleaned_df is None:
+            return None
+        
+        self._save_processed_data(exchange, {symbol: cleaned_df})
+        return cleaned_df
+    
+    def _clean_and_validate(
+        self,
+        df: pd.DataFrame,
+        exchange: str,
+        symbol: str,
+        dropped: Optional[Dict] = None
+    ) -> Tuple[Optional[pd.DataFrame], Dict]:
+        """
+        Clean one symbol's data and validate the result.
+        
+        Args:
+            df: Raw DataFrame
+            exchange: Exchange name for logging
+            symbol: Symbol name for logging
+            dropped: Rows already dropped while reading, as counted by _read_raw_file
+        
+        Returns:
+            Tuple of (cleaned DataFrame or None if validation failed, cleaning summary)
+        """
+        cleaned_df, summary = self._clean(df, exchange, symbol, dropped)
+        if not self.validate_data(cleaned_df, exchange, symbol, summary):
+            logger.error(f"❌ Validation failed for {exchange}/{symbol}")
+            return None, summary
+        return cleaned_df, summary
+    
+    def _log_cleaning(self, exchange: str, summaries: List[Dict]):
+        """
+        Log one aggregate line for the cleaning of an exchange's symbols.
+        
+        Args:
+            exchange: Exchange name
+            summaries: Cleaning summaries as returned by _clean
+        """
+        totals = {
+            key: sum(summary[key] for summary in summaries)
+            for key in ('duplicates', 'incomplete', 'filtered', 'records')
+        }
+        logger.info(
+            f"🧹 Cleaned {len(summaries)} {exchange} symbol(s): "
+            f"{totals['duplicates']} duplicates, {totals['incomplete']} incomplete, "
+            f"{totals['filtered']} filtered, {totals['records']} records kept"
+        )
+    
+    def _read_raw_file(self, filepath: str) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Read a raw trade file written by DataDownloader.
+        
+        The file is streamed in batches (chunk_size rows for Parquet, one
+        block for CSV). Rows that clean_data would drop regardless of the
+        rest of the file (duplicates within a batch, missing values,
+        non-positive price or quantity) are discarded per batch, so the
+        full raw file never sits in memory. The outlier cut needs file-wide
+        statistics and is left to clean_data.
+        
+        Args:
+            filepath: Path to a Parquet or CSV file
+        
+        Returns:
+            Tuple of (raw trades DataFrame with categorical exchange/symbol/side
+            columns, duplicates/incomplete/filtered counts of the dropped rows)
+        """
+        if filepath.endswith('.parquet'):
+            parquet_file = pq.ParquetFile(filepath, memory_map=True)
+            schema = parquet_file.schema_arrow
+            batches = parquet_file.iter_batches(batch_size=self.chunk_size)
+        else:
+            reader = pacsv.open_csv(
+                pa.memory_map(filepath),
+                read_options=CSV_READ_OPTIONS,
+                convert_options=CSV_CONVERT_OPTIONS
+            )
+            schema = reader.schema
+            batches = reader
+        
+        parts = []
+        dropped = {'duplicates': 0, 'incomplete': 0, 'filtered': 0}
+        for batch in batches:
+            part, counts = self._drop_invalid_rows(batch.to_pandas())
+            parts.append(part)
+            for key, count in counts.items():
+                dropped[key] += count
+        df = pd.concat(parts, ignore_index=True) if parts else schema.empty_table().to_pandas()
+        
+        # Categorize after the concat: batches with different categories would fall back to object
+        categories = {column: 'category' for column in CATEGORY_COLUMNS if column in df.columns}
+        return df.astype(categories), dropped
+    
+    def _drop_invalid_rows(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Drop duplicate and invalid rows from one raw batch.
+        
+        Args:
+            df: Raw batch
+        
+        Returns:
+            Tuple of (batch without rows that clean_data would drop anyway,
+            duplicates/incomplete/filtered counts of the dropped rows)
+        """
+        if 'price' not in df.columns or 'quantity' not in df.columns:
+            return df, {'duplicates': 0, 'incomplete': 0, 'filtered': 0}
+        
+        initial_count = len(df)
+        df = _drop_duplicates(df)
+        duplicates = initial_count - len(df)
+        complete = df.notna().all(axis=1).to_numpy()
+        mask = _row_mask(
+            df['price'].to_numpy(dtype=np.float64, na_value=np.nan),
+            df['quantity'].to_numpy(dtype=np.float64, na_value=np.nan),
+            complete,
+            outliers=False
+        )
+        incomplete = len(df) - np.count_nonzero(complete)
+        kept = np.flatnonzero(mask)
+        counts = {
+            'duplicates': duplicates,
+            'incomplete': incomplete,
+            'filtered': len(df) - incomplete - len(kept)
+        }
+        return df.iloc[kept], counts
+    
     def _save_processed_data(self, exchange: str, data: Dict[str, pd.DataFrame]):
         """
-        Save processed data to CSV files.
+        Save processed data to Snappy-compressed Parquet files.
+        
+        Each DataFrame is converted to an Arrow table once; the Parquet file
+        and the CSV copy enabled by csv_copy are both written from it by
+        Arrow's C++ writers.
         
         Args:
             exchange: Exchange name
             data: Dictionary of processed DataFrames
         """
         exchange_dir = f"{self.processed_dir}/{exchange}"
-        os.makedirs(exchange_dir, exist_ok=True)
+        if exchange_dir not in self._created_dirs:
+            os.makedirs(exchange_dir, exist_ok=True)
+            self._created_dirs.add(exchange_dir)
         
         for symbol, df in data.items():
-            filename = f"{exchange_dir}/{symbol}.csv"
-            df.to_csv(filename, index=False)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_table(table, f"{exchange_dir}/{symbol}.parquet", compression='snappy')
+            if self.csv_copy:
+                pacsv.write_csv(table, f"{exchange_dir}/{symbol}.csv", write_options=CSV_WRITE_OPTIONS)
             logger.info(f"💾 Saved processed {exchange}/{symbol}: {len(df)} records")
     
-    def process_all_data(self) -> Dict[str, Dict[str, pd.DataFrame]]:
+    def load_processed_data(
+        self,
+        exchange: str,
+        columns: Optional[List[str]] = PROCESSED_COLUMNS
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Load the processed Parquet files of one exchange.
+        
+        Args:
+            exchange: Exchange name
+            columns: Columns to read, pushed down to the Parquet reader; None reads all
+        
+        Returns:
+            Dictionary mapping symbol names to DataFrames
+        """
+        exchange_dir = f"{self.processed_dir}/{exchange}"
+        data = {}
+        
+        if not os.path.exists(exchange_dir):
+            logger.error(f"Processed directory not found: {exchange_dir}")
+            return data
+        
+        with os.scandir(exchange_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.parquet'):
+                    symbol = os.path.splitext(entry.name)[0]
+                    data[symbol] = pd.read_parquet(entry.path, columns=columns)
+        
+        return data
+    
+    def process_all_data(self) -> Dict[str, Dict[str, int]]:
         """
         Process data for all exchanges.
         
+        Each exchange runs in its own worker process, so the CPU-bound pandas
+        work is not serialized by the GIL. The processor itself is pickled to
+        the workers, keeping any settings changed after construction. Workers
+        are spawned rather than forked from a parent that may already run
+        Arrow and thread pools, and they save their output themselves;
+        load the frames back with load_processed_data.
+        
         Returns:
-            Dictionary containing all processed data
+            Dictionary of exchange -> symbol -> processed record count
         """
         logger.info("🚀 Starting data processing pipeline...")
         logger.info("=" * 60)
         
         exchanges = ["binance", "coinbase", "kraken"]
-        all_processed_data = {}
         
-        for exchange in exchanges:
-            processed_data = self.process_exchange(exchange)
-            all_processed_data[exchange] = processed_data
+        # Exchanges write to separate directories, so they can be processed concurrently
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(exchanges), mp_context=context) as executor:
+            all_processed_data = dict(zip(
+                exchanges, executor.map(_process_exchange_counts, repeat(self), exchanges)
+            ))
         
         logger.info("\n✅ Data processing completed!")
         logger.info(f"📁 Processed data saved in: {self.processed_dir}/")
@@ -318,8 +745,8 @@ def main():
     print("=" * 30)
     for exchange, data in processed_data.items():
         print(f"{exchange.upper()}:")
-        for symbol, df in data.items():
-            print(f"  {symbol}: {len(df)} records")
+        for symbol, records in data.items():
+            print(f"  {symbol}: {records} records")
     
     return processed_data
 
@@ -0,0 +1,57 @@
+"""
+Shared pytest configuration for the test suite
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add src to path once for every test module
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from data_manipulation.data_downloader import DataDownloader
+from data_manipulation.data_processor import DataProcessor
+
+
+def pytest_configure(config):
+    """Register the test group markers; pytest.ini keeps its options under [tool:pytest], which pytest skips"""
+    config.addinivalue_line("markers", "io: test reads or writes files")
+    config.addinivalue_line("markers", "cpu: test runs in memory only")
+    config.addinivalue_line("markers", "integration: test needs the network; opt in with RUN_INTEGRATION=1")
+
+
+def pytest_collection_modifyitems(items):
+    """Mark tests using tmp_path as io, and every test not marked io as cpu
+    
+    Tests and fixtures that touch disk request tmp_path (directly or through a
+    fixture), so the fixture closure is the signal; anything else has to carry
+    an explicit io marker.
+    """
+    for item in items:
+        if item.get_closest_marker("io") is None and "tmp_path" in item.fixturenames:
+            item.add_marker(pytest.mark.io)
+        if item.get_closest_marker("io") is None:
+            item.add_marker(pytest.mark.cpu)
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    """DataDownloader writing into a per-test temporary directory"""
+    # The constructor creates data/<date> relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    downloader = DataDownloader(date="2025-10-01")
+    downloader.data_dir = str(tmp_path)
+    return downloader
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """DataProcessor reading from and saving into a per-test temporary directory"""
+    # The constructor creates data/processed/<name> relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    processor = DataProcessor(data_dir=str(tmp_path))
+    processor.processed_dir = str(tmp_path / "processed")
+    return processor
@@ -6,30 +6,25 @@ import pytest
 import pandas as pd
 import numpy as np
 import os
-import tempfile
 from unittest.mock import Mock, patch
-import sys
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
-# Add src to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from analysis.arbitrage_detector import ArbitrageDetector, _directional_profits
 
-from analysis.arbitrage_detector import ArbitrageDetector
+# Fixed price and quantity columns for files whose values are never asserted on
+_PRICES = np.linspace(40000, 50000, 10)
+_QTYS = np.linspace(0.001, 1.0, 10)
 
 
 class TestArbitrageDetector:
     """Test cases for ArbitrageDetector class"""
     
     def setup_method(self):
-        """Setup test environment"""
-        self.temp_dir = tempfile.mkdtemp()
+        """Setup test environment; tests that touch disk request tmp_path themselves"""
         self.detector = ArbitrageDetector(latency_risk=0.3)
     
-    def teardown_method(self):
-        """Cleanup test environment"""
-        import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-    
     def test_init(self):
         """Test ArbitrageDetector initialization"""
         detector = ArbitrageDetector(latency_risk=0.5)
@@ -84,24 +79,61 @@ class TestArbitrageDetector:
         assert result["is_profitable"] is False
         assert result["gross_profit_percentage"] < 1.0
     
-    def test_load_processed_data(self):
+    def test_fee_change_after_construction(self, monkeypatch):
+        """Test that fee_rates edited after construction reach both the scalar and the cube path"""
+        data = {
+            exchange: {symbol: pd.DataFrame({
+                'timestamp': pd.date_range('2025-10-01', periods=3, freq='1min'),
+                'price': [price] * 3
+            })}
+            for exchange, symbol, price in [
+                ("binance", "btcusdt", 100.0), ("coinbase", "btc_usd", 100.05), ("kraken", "xbt_usd", 100.0)
+            ]
+        }
+        assert not self.detector.calculate_arbitrage_opportunity(
+            "binance", "coinbase", "btc_usd", 100.0, 100.05
+        )["is_profitable"]
+        assert len(self.detector.find_arbitrage_opportunities(data)) == 0
+        
+        for rates in self.detector.fee_rates.values():
+            monkeypatch.setitem(rates, "taker", 0.0)
+        
+        assert self.detector.calculate_arbitrage_opportunity(
+            "binance", "coinbase", "btc_usd", 100.0, 100.05
+        )["is_profitable"]
+        assert len(self.detector.find_arbitrage_opportunities(data)) > 0
+    
+    def test_kernel_matches_directional_profits(self):
+        """Test the unrolled kernel against the generic broadcast version"""
+        prices = np.random.default_rng(2).uniform(40000, 50000, (50, 3, 3)).astype(np.float32)
+        prices[0, 0, 1] = np.nan
+        taker = self.detector._taker.astype(np.float32)
+        
+        expected = _directional_profits(prices, taker, self.detector.latency_risk)
+        result = self.detector._kernel(prices, (1 - self.detector.latency_risk) * 100)
+        
+        for got, want in zip(result, expected):
+            assert got.shape == want.shape
+            np.testing.assert_allclose(got, want, rtol=1e-5)
+    
+    def test_load_processed_data(self, tmp_path):
         """Test loading processed data"""
-        # Create test data structure
-        processed_dir = os.path.join(self.temp_dir, "processed")
+        # One frame shared by every exchange; the loader reads only timestamp and price
+        processed_dir = os.path.join(tmp_path, "processed")
+        table = pa.Table.from_pandas(pd.DataFrame({
+            'timestamp': pd.date_range('2025-10-01', periods=10, freq='1min'),
+            'symbol': ['btcusdt'] * 10,
+            'price': _PRICES,
+            'quantity': _QTYS,
+            'side': ['buy', 'sell'] * 5
+        }), preserve_index=False)
+        
+        # Parquet as DataProcessor writes it, plus one legacy CSV directory
         for exchange in ["binance", "coinbase", "kraken"]:
-            exchange_dir = os.path.join(processed_dir, exchange)
-            os.makedirs(exchange_dir, exist_ok=True)
-            
-            # Create test CSV
-            df = pd.DataFrame({
-                'timestamp': pd.date_range('2025-10-01', periods=10, freq='1min'),
-                'exchange': [exchange] * 10,
-                'symbol': ['btcusdt'] * 10,
-                'price': np.random.uniform(40000, 50000, 10),
-                'quantity': np.random.uniform(0.001, 1.0, 10),
-                'side': ['buy', 'sell'] * 5
-            })
-            df.to_csv(os.path.join(exchange_dir, "btcusdt.csv"), index=False)
+            os.makedirs(os.path.join(processed_dir, exchange), exist_ok=True)
+        pq.write_table(table, os.path.join(processed_dir, "binance", "btcusdt.parquet"))
+        pq.write_table(table, os.path.join(processed_dir, "coinbase", "btcusdt.parquet"))
+        pacsv.write_csv(table, os.path.join(processed_dir, "kraken", "btcusdt.csv"))
         
         result = self.detector.load_processed_data(processed_dir)
         
@@ -110,6 +142,47 @@ class TestArbitrageDetector:
             assert exchange in result
             assert "btcusdt" in result[exchange]
             assert len(result[exchange]["btcusdt"]) == 10
+            assert list(result[exchange]["btcusdt"].columns) == ['timestamp', 'price']
+            assert result[exchange]["btcusdt"]["price"].dtype == np.float32
+            assert pd.api.types.is_datetime64_any_dtype(result[exchange]["btcusdt"]["timestamp"])
+    
+    def test_load_processed_data_prefers_parquet(self, tmp_path):
+        """Test that a Parquet copy is preferred over the CSV"""
+        exchange_dir = os.path.join(tmp_path, "processed", "binance")
+        os.makedirs(exchange_dir, exist_ok=True)
+
+        df = pd.DataFrame({
+            'timestamp': pd.date_range('2025-10-01', periods=10, freq='1min'),
+            'price': [50000.0] * 10
+        })
+        df.to_csv(os.path.join(exchange_dir, "btcusdt.csv"), index=False)
+        df.iloc[:5].to_parquet(os.path.join(exchange_dir, "btcusdt.parquet"), index=False)
+
+        result = self.detector.load_processed_data(os.path.join(tmp_path, "processed"))
+
+        assert len(result["binance"]["btcusdt"]) == 5
+        assert pd.api.types.is_datetime64_any_dtype(result["binance"]["btcusdt"]["timestamp"])
+
+    def test_load_processed_data_keeps_file_order(self, tmp_path):
+        """Test that symbols come back in directory order even when reads finish out of order"""
+        import time
+        
+        exchange_dir = os.path.join(tmp_path, "processed", "binance")
+        os.makedirs(exchange_dir, exist_ok=True)
+        for symbol in ["btcusdt", "ethusdt", "solusdt"]:
+            open(os.path.join(exchange_dir, f"{symbol}.parquet"), "wb").close()
+        listed = [os.path.splitext(name)[0] for name in os.listdir(exchange_dir)]
+        
+        def read(filepath):
+            # The first file finishes last
+            if os.path.basename(filepath) == f"{listed[0]}.parquet":
+                time.sleep(0.05)
+            return pd.DataFrame({'timestamp': [], 'price': []})
+        
+        with patch.object(self.detector, '_read_parquet', side_effect=read):
+            result = self.detector.load_processed_data(os.path.join(tmp_path, "processed"))
+        
+        assert list(result["binance"]) == listed
     
     def test_load_processed_data_missing_dir(self):
         """Test loading from missing directory"""
@@ -140,6 +213,59 @@ class TestArbitrageDetector:
         # Should find opportunities due to price difference
         assert isinstance(opportunities, list)
     
+    def test_find_arbitrage_opportunities_time_aligned(self):
+        """Test opportunities are found at every aligned timestamp"""
+        data = {
+            "binance": {
+                "btcusdt": pd.DataFrame({
+                    'timestamp': pd.date_range('2025-10-01', periods=3, freq='1min'),
+                    'price': [50000.0, 50000.0, 61000.0]
+                })
+            },
+            "coinbase": {
+                "btc_usd": pd.DataFrame({
+                    'timestamp': pd.date_range('2025-10-01 00:00:30', periods=2, freq='1min'),
+                    'price': [60000.0] * 2
+                })
+            }
+        }
+
+        opportunities = self.detector.find_arbitrage_opportunities(data)
+
+        # binance -> coinbase from 00:00:30 onwards, then reversed at 00:02:00
+        directions = [(opp['buy_exchange'], opp['sell_exchange']) for opp in opportunities]
+        assert directions.count(("binance", "coinbase")) == 3
+        assert directions.count(("coinbase", "binance")) == 1
+        assert all("timestamp" in opp for opp in opportunities)
+        
+        # Sorted by profitability, best first
+        profits = [opp['risk_adjusted_percentage'] for opp in opportunities]
+        assert profits == sorted(profits, reverse=True)
+
+    def test_iter_arbitrage_opportunities(self):
+        """Test streaming opportunities in small chunks"""
+        data = {
+            "binance": {
+                "btcusdt": pd.DataFrame({
+                    'timestamp': pd.date_range('2025-10-01', periods=5, freq='1min'),
+                    'price': [50000.0] * 5
+                })
+            },
+            "coinbase": {
+                "btc_usd": pd.DataFrame({
+                    'timestamp': pd.date_range('2025-10-01', periods=5, freq='1min'),
+                    'price': [60000.0] * 5
+                })
+            }
+        }
+        
+        opportunities = self.detector.iter_arbitrage_opportunities(data, chunk_size=2)
+        
+        assert not isinstance(opportunities, list)
+        streamed = list(opportunities)
+        assert len(streamed) == 5
+        assert len(self.detector.find_arbitrage_opportunities(data)) == 5
+    
     def test_find_arbitrage_opportunities_no_data(self):
         """Test finding opportunities with no data"""
         opportunities = self.detector.find_arbitrage_opportunities({})
@@ -171,6 +297,34 @@ class TestArbitrageDetector:
         assert "btcusdt" in performance["binance"]["symbols"]
         assert "btc_usd" in performance["coinbase"]["symbols"]
     
+    def test_to_tidy_frame(self):
+        """Test flattening nested data into a tidy frame"""
+        data = {
+            "binance": {
+                "btcusdt": pd.DataFrame({
+                    'timestamp': pd.date_range('2025-10-01 00:01', periods=2, freq='1min'),
+                    'price': [50000.0] * 2
+                })
+            },
+            "coinbase": {
+                "btc_usd": pd.DataFrame({
+                    'timestamp': pd.date_range('2025-10-01', periods=2, freq='1min'),
+                    'price': [51000.0] * 2
+                })
+            }
+        }
+        
+        tidy = ArbitrageDetector.to_tidy_frame(data)
+        
+        assert list(tidy.columns) == ['timestamp', 'exchange', 'symbol', 'price']
+        assert len(tidy) == 4
+        assert tidy['timestamp'].is_monotonic_increasing
+        assert tidy.iloc[0]['exchange'] == "coinbase"
+        
+        # Detector methods accept the tidy frame directly
+        performance = self.detector.analyze_exchange_performance(tidy)
+        assert performance["binance"]["total_trades"] == 2
+    
     def test_generate_report(self):
         """Test report generation"""
         opportunities = [
@@ -197,6 +351,23 @@ class TestArbitrageDetector:
         assert "binance" in report
         assert "coinbase" in report
     
+    def test_generate_report_total_override(self):
+        """Test report count when only the top opportunities are passed"""
+        opportunities = [
+            {
+                "buy_exchange": "binance",
+                "sell_exchange": "coinbase",
+                "symbol": "btc_usd",
+                "buy_price": 50000.0,
+                "sell_price": 51000.0,
+                "risk_adjusted_percentage": 1.5
+            }
+        ]
+        
+        report = self.detector.generate_report(opportunities, {}, total_opportunities=42)
+        
+        assert "Total Opportunities: 42" in report
+    
     def test_generate_report_no_opportunities(self):
         """Test report generation with no opportunities"""
         opportunities = []
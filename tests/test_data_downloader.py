@@ -5,30 +5,20 @@ Unit tests for DataDownloader module
 import pytest
 import pandas as pd
 import os
-import tempfile
+from datetime import datetime
 from unittest.mock import Mock, patch, AsyncMock
-import sys
 
-# Add src to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from data.data_downloader import DataDownloader
+from data_manipulation.data_downloader import DataDownloader, TradeBuffer, TRADE_SCHEMA, REPLAY_JSON, SYMBOLS
 
 
 class TestDataDownloader:
     """Test cases for DataDownloader class"""
     
-    def setup_method(self):
-        """Setup test environment"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.downloader = DataDownloader(date="2025-10-01")
-        self.downloader.data_dir = self.temp_dir
-    
-    def teardown_method(self):
-        """Cleanup test environment"""
-        import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, downloader):
+        """Setup test environment; pytest cleans up tmp_path"""
+        self.temp_dir = str(tmp_path)
+        self.downloader = downloader
     
     def test_init(self):
         """Test DataDownloader initialization"""
@@ -39,7 +29,31 @@ class TestDataDownloader:
         assert "coinbase" in downloader.exchanges
         assert "kraken" in downloader.exchanges
     
-    def test_process_binance_message(self):
+    def test_symbols_are_per_instance(self):
+        """Test that narrowing one downloader's symbols leaves the module defaults intact"""
+        self.downloader.symbols["binance"].remove("solusdt")
+        
+        assert DataDownloader(date="2025-10-01").symbols["binance"] == ["btcusdt", "ethusdt", "solusdt"]
+        assert SYMBOLS["binance"] == ("btcusdt", "ethusdt", "solusdt")
+    
+    def test_end_date_cached(self):
+        """Test that replay end dates are formatted once per duration"""
+        assert self.downloader._end_date(60) == "2025-10-01T01:00:00"
+        assert self.downloader._end_date(1440) == "2025-10-02T00:00:00"
+        assert self.downloader._end_date(60) is self.downloader._end_date(60)
+        assert set(self.downloader._end_dates) == {60, 1440}
+    
+    def test_trade_file_path_creates_dir_once(self):
+        """Test that the exchange directory is created on first use only"""
+        with patch('os.makedirs', wraps=os.makedirs) as mock_makedirs:
+            first = self.downloader._trade_file_path("kraken", "XBT/USD")
+            second = self.downloader._trade_file_path("kraken", "ETH/USD")
+        
+        assert mock_makedirs.call_count == 1
+        assert first == os.path.join(self.temp_dir, "kraken", "xbt_usd.parquet")
+        assert os.path.dirname(second) == os.path.dirname(first)
+    
+    def test_append_binance_message(self):
         """Test Binance message processing"""
         message = {
             "data": {
@@ -52,9 +66,10 @@ class TestDataDownloader:
         }
         timestamp = "2025-10-01T12:00:00"
         
-        result = self.downloader._process_binance_message(message, timestamp)
+        buffer = TradeBuffer("binance")
         
-        assert result is not None
+        assert self.downloader._append_binance_message(message, timestamp, buffer) is True
+        (result,) = buffer.to_record_batch().to_pylist()
         assert result["exchange"] == "binance"
         assert result["symbol"] == "BTCUSDT"
         assert result["price"] == 50000.00
@@ -62,7 +77,7 @@ class TestDataDownloader:
         assert result["side"] == "buy"
         assert result["trade_id"] == 12345
     
-    def test_process_coinbase_message(self):
+    def test_append_coinbase_message(self):
         """Test Coinbase message processing"""
         message = {
             "product_id": "BTC-USD",
@@ -73,9 +88,10 @@ class TestDataDownloader:
         }
         timestamp = "2025-10-01T12:00:00"
         
-        result = self.downloader._process_coinbase_message(message, timestamp)
+        buffer = TradeBuffer("coinbase")
         
-        assert result is not None
+        assert self.downloader._append_coinbase_message(message, timestamp, buffer) is True
+        (result,) = buffer.to_record_batch().to_pylist()
         assert result["exchange"] == "coinbase"
         assert result["symbol"] == "BTC-USD"
         assert result["price"] == 50000.00
@@ -83,14 +99,15 @@ class TestDataDownloader:
         assert result["side"] == "buy"
         assert result["trade_id"] == 12345
     
-    def test_process_kraken_message(self):
+    def test_append_kraken_message(self):
         """Test Kraken message processing"""
         message = [123, [[50000.00, 0.001, 1633084800.0, 'b', 'market', '']], 'trade', 'XBT/USD']
         timestamp = "2025-10-01T12:00:00"
         
-        result = self.downloader._process_kraken_message(message, timestamp)
+        buffer = TradeBuffer("kraken")
         
-        assert result is not None
+        assert self.downloader._append_kraken_message(message, timestamp, buffer) is True
+        (result,) = buffer.to_record_batch().to_pylist()
         assert result["exchange"] == "kraken"
         assert result["symbol"] == "XBT/USD"
         assert result["price"] == 50000.00
@@ -98,38 +115,74 @@ class TestDataDownloader:
         assert result["side"] == "buy"
         assert result["trade_id"] == 123
     
-    def test_process_message_unknown_exchange(self):
-        """Test processing message from unknown exchange"""
-        message = {"test": "data"}
-        timestamp = "2025-10-01T12:00:00"
+    def test_trade_buffer(self):
+        """Test that buffered rows become a typed record batch and the buffer can be reused"""
+        buffer = TradeBuffer("kraken")
+        buffer.add("2025-10-01T12:00:00", "XBT/USD", 50000.0, 0.001, "buy", 1)
+        buffer.add("2025-10-01T12:00:01", "XBT/USD", 50001.0, 0.002, "sell", 2)
         
-        result = self.downloader._process_message("unknown", message, timestamp)
+        batch = buffer.to_record_batch()
         
-        assert result is None
+        assert batch.schema == TRADE_SCHEMA
+        assert batch.column("price").to_pylist() == [50000.0, 50001.0]
+        assert batch.column("exchange").to_pylist() == ["kraken", "kraken"]
+        
+        buffer.clear()
+        assert len(buffer) == 0
+        assert buffer.to_record_batch().num_rows == 0
     
-    def test_save_data_to_csv(self):
-        """Test saving data to CSV"""
-        data = [
-            {
-                "timestamp": "2025-10-01T12:00:00",
-                "exchange": "binance",
-                "symbol": "BTCUSDT",
-                "price": 50000.00,
-                "quantity": 0.001,
-                "side": "buy",
-                "trade_id": 12345
-            }
+    def test_trade_buffer_bad_value(self):
+        """Test that a row with a bad value leaves the columns aligned"""
+        buffer = TradeBuffer("binance")
+        
+        with pytest.raises(ValueError):
+            buffer.add("2025-10-01T12:00:00", "BTCUSDT", 50000.0, 0.001, "buy", "abc")
+        
+        assert len(buffer) == 0
+        assert buffer.timestamps == [] and buffer.symbols == []
+    
+    def test_append_messages(self):
+        """Test that appenders write trades straight into a shared buffer"""
+        buffer = TradeBuffer("kraken")
+        
+        added = [
+            self.downloader._append_kraken_message(
+                [7, [[50000.00, 0.001, 1633084800.0, 'b', 'market', '']], 'trade', 'XBT/USD'], "2025-10-01T12:00:00", buffer
+            ),
+            self.downloader._append_kraken_message([7, "heartbeat"], "2025-10-01T12:00:01", buffer)
         ]
         
-        filename = self.downloader._save_data_to_csv("binance", "btcusdt", data)
+        assert added == [True, False]
+        assert len(buffer) == 1
+        assert buffer.to_record_batch().to_pylist() == [{
+            "timestamp": datetime(2025, 10, 1, 12), "exchange": "kraken", "symbol": "XBT/USD",
+            "price": 50000.0, "quantity": 0.001, "side": "buy", "trade_id": 7
+        }]
+    
+    @pytest.mark.asyncio
+    async def test_download_exchange_data_unknown_exchange(self):
+        """Test downloading from an exchange without a message parser"""
+        with patch.object(self.downloader.tardis_client, 'replay') as mock_replay:
+            result = await self.downloader.download_exchange_data("unknown", "btcusdt", 60)
+        
+        assert result is None
+        mock_replay.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_download_exchange_data_skips_bad_message(self):
+        """Test that a malformed message is skipped without aborting the download"""
+        good = [123, [[50000.00, 0.001, 1633084800.0, 'b', 'market', '']], 'trade', 'XBT/USD']
+        bad = [123, [], 'trade', 'XBT/USD']
         
-        assert filename is not None
-        assert os.path.exists(filename)
+        with patch.object(self.downloader.tardis_client, 'replay') as mock_replay:
+            mock_replay.return_value = AsyncMock()
+            mock_replay.return_value.__aiter__.return_value = [
+                ("2025-10-01T12:00:00", good), ("2025-10-01T12:00:01", bad), ("2025-10-01T12:00:02", good)
+            ]
+            
+            result = await self.downloader.download_exchange_data("kraken", "XBT/USD", 60)
         
-        # Verify CSV content
-        df = pd.read_csv(filename)
-        assert len(df) == 1
-        assert df.iloc[0]["price"] == 50000.00
+        assert len(pd.read_parquet(result)) == 2
     
     @pytest.mark.asyncio
     async def test_download_exchange_data_no_data(self):
@@ -163,6 +216,67 @@ class TestDataDownloader:
             
             assert result is not None
             assert os.path.exists(result)
+        
+        # Verify Parquet content
+        df = pd.read_parquet(result)
+        assert list(df.columns) == TRADE_SCHEMA.names
+        assert df.iloc[0]["price"] == 50000.00
+        assert df["timestamp"].iloc[0] == pd.Timestamp("2025-10-01T12:00:00")
+    
+    @pytest.mark.asyncio
+    async def test_download_exchange_data_replay_json(self):
+        """Test that replayed messages are decoded with the configured JSON module"""
+        with patch.object(self.downloader.tardis_client, 'replay') as mock_replay:
+            mock_replay.return_value = AsyncMock()
+            mock_replay.return_value.__aiter__.return_value = []
+            
+            await self.downloader.download_exchange_data("binance", "btcusdt", 60)
+        
+        assert mock_replay.call_args.kwargs['json'] is REPLAY_JSON
+    
+    @pytest.mark.asyncio
+    async def test_download_exchange_data_streams_batches(self):
+        """Test that long replays are flushed in batches and fully written"""
+        import asyncio
+        
+        messages = [
+            ("2025-10-01T12:00:00", {"data": {"s": "BTCUSDT", "p": str(50000 + i), "q": "0.001", "m": False, "t": i}})
+            for i in range(25)
+        ]
+        self.downloader.batch_size = 10
+        
+        with patch.object(self.downloader.tardis_client, 'replay') as mock_replay:
+            mock_replay.return_value = AsyncMock()
+            mock_replay.return_value.__aiter__.return_value = messages
+            
+            with patch.object(asyncio, 'to_thread', wraps=asyncio.to_thread) as mock_to_thread:
+                result = await self.downloader.download_exchange_data("binance", "btcusdt", 60)
+        
+        # Two full batches and the remainder, each written off the event loop
+        assert mock_to_thread.await_count == 3
+        df = pd.read_parquet(result)
+        assert len(df) == 25
+        assert df["trade_id"].tolist() == list(range(25))
+    
+    @pytest.mark.asyncio
+    async def test_download_exchange_data_rate_limited(self):
+        """Test retrying with backoff after a 429 response"""
+        import urllib.error
+        
+        mock_message = {"data": {"s": "BTCUSDT", "p": "50000.00", "q": "0.001", "m": False, "t": 1}}
+        messages = AsyncMock()
+        messages.__aiter__.return_value = [("2025-10-01T12:00:00", mock_message)]
+        throttled = urllib.error.HTTPError("url", 429, "Too Many Requests", None, None)
+        
+        with patch.object(self.downloader.tardis_client, 'replay') as mock_replay, \
+             patch('asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            mock_replay.side_effect = [throttled, throttled, messages]
+            
+            result = await self.downloader.download_exchange_data("binance", "btcusdt", 60)
+            
+            assert result is not None
+            assert mock_replay.call_count == 3
+            assert [call.args[0] for call in mock_sleep.call_args_list] == [1, 2]
     
     @pytest.mark.asyncio
     async def test_download_exchange_data_exception(self):
@@ -184,3 +298,60 @@ class TestDataDownloader:
             
             assert len(result) == 9  # 3 exchanges * 3 symbols
             assert all(filename == "test_file.csv" for filename in result)
+    
+    @pytest.mark.asyncio
+    async def test_download_all_data_bounded(self):
+        """Test that no more than max_concurrent_downloads replays run at once"""
+        import asyncio
+        
+        running = 0
+        peak = 0
+        
+        def replay(**kwargs):
+            async def messages():
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                yield ("2025-10-01T12:00:00", {"data": {"s": "BTCUSDT", "p": "50000", "q": "0.001", "m": False, "t": 1}})
+            return messages()
+        
+        self.downloader.max_concurrent_downloads = 2
+        with patch.object(self.downloader.tardis_client, 'replay', side_effect=replay):
+            await self.downloader.download_all_data(60)
+        
+        assert peak == 2
+    
+    @pytest.mark.asyncio
+    async def test_download_all_data_queue(self):
+        """Test that finished files are pushed to the queue"""
+        import asyncio
+        
+        queue = asyncio.Queue()
+        with patch.object(self.downloader, 'download_exchange_data') as mock_download:
+            mock_download.side_effect = lambda exchange, symbol, duration: (
+                None if exchange == "kraken" else f"{exchange}_{symbol}.csv"
+            )
+            
+            result = await self.downloader.download_all_data(60, queue=queue)
+            
+            assert len(result) == 6
+            assert sorted(queue.get_nowait() for _ in range(queue.qsize())) == sorted(result)
+    
+    @pytest.mark.asyncio
+    async def test_download_all_data_partial_failure(self):
+        """Test that one failing download does not drop the others"""
+        def download(exchange, symbol, duration):
+            if symbol == "ETH-USD":
+                raise RuntimeError("connection reset")
+            return f"{exchange}_{symbol}.csv"
+        
+        with patch.object(self.downloader, 'download_exchange_data') as mock_download:
+            mock_download.side_effect = download
+            
+            result = await self.downloader.download_all_data(60)
+            
+            assert len(result) == 8
+            assert result[0] == "binance_btcusdt.csv"
+            assert "coinbase_ETH-USD.csv" not in result
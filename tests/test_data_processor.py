@@ -6,30 +6,23 @@ import pytest
 import pandas as pd
 import numpy as np
 import os
-import tempfile
 from unittest.mock import Mock, patch
-import sys
 
-# Add src to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from data_manipulation.data_processor import DataProcessor, _drop_duplicates, _row_mask
 
-from data.data_processor import DataProcessor
+# Shared fixture inputs, built once per module
+_TIMESTAMPS = pd.date_range('2025-10-01', periods=100, freq='1min').to_numpy()
+_RNG = np.random.default_rng(0)
 
 
 class TestDataProcessor:
     """Test cases for DataProcessor class"""
     
-    def setup_method(self):
-        """Setup test environment"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.processor = DataProcessor(data_dir=self.temp_dir)
-        self.processor.processed_dir = os.path.join(self.temp_dir, "processed")
-    
-    def teardown_method(self):
-        """Cleanup test environment"""
-        import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, processor):
+        """Setup test environment; pytest cleans up tmp_path"""
+        self.temp_dir = str(tmp_path)
+        self.processor = processor
     
     def test_init(self):
         """Test DataProcessor initialization"""
@@ -38,27 +31,41 @@ class TestDataProcessor:
         assert processor.processed_dir == "data/processed/test_data"
         assert len(processor.required_columns) == 6
         assert processor.max_price == 1000000
+        assert processor.csv_copy is False
     
-    def create_test_dataframe(self):
-        """Create test DataFrame"""
+    def create_test_dataframe(self, n=100):
+        """Create test DataFrame with n rows"""
+        if n <= len(_TIMESTAMPS):
+            timestamps = _TIMESTAMPS[:n].copy()
+        else:
+            timestamps = pd.date_range('2025-10-01', periods=n, freq='1min')
         data = {
-            'timestamp': pd.date_range('2025-10-01', periods=100, freq='1min'),
-            'exchange': ['binance'] * 100,
-            'symbol': ['btcusdt'] * 100,
-            'price': np.random.uniform(40000, 50000, 100),
-            'quantity': np.random.uniform(0.001, 1.0, 100),
-            'side': ['buy', 'sell'] * 50
+            'timestamp': timestamps,
+            'exchange': np.full(n, 'binance', dtype=object),
+            'symbol': np.full(n, 'btcusdt', dtype=object),
+            'price': _RNG.uniform(40000, 50000, n),
+            'quantity': _RNG.uniform(0.001, 1.0, n),
+            'side': np.resize(np.array(['buy', 'sell'], dtype=object), n)
         }
         return pd.DataFrame(data)
     
+    def append_copies(self, df, positions):
+        """Append copies of the rows at positions, building the frame once from column arrays"""
+        return pd.DataFrame({
+            column: np.concatenate([df[column].to_numpy(), df[column].to_numpy()[positions]])
+            for column in df.columns
+        })
+    
     def test_clean_data(self):
         """Test data cleaning"""
         df = self.create_test_dataframe()
         
         # Add some duplicates and missing values
-        df = pd.concat([df, df.iloc[:5]])  # Add duplicates
-        df.loc[10:15, 'price'] = np.nan  # Add missing values
-        df.loc[20:25, 'price'] = -1000  # Add negative prices
+        df = self.append_copies(df, np.arange(5))  # Add duplicates
+        price = df['price'].to_numpy(copy=True)
+        price[10:16] = np.nan  # Add missing values
+        price[20:26] = -1000  # Add negative prices
+        df['price'] = price
         
         cleaned_df = self.processor.clean_data(df, "binance", "btcusdt")
         
@@ -66,6 +73,67 @@ class TestDataProcessor:
         assert cleaned_df['price'].min() > 0
         assert not cleaned_df['price'].isna().any()
     
+    def test_clean_data_outliers_and_missing(self):
+        """Test that outliers and rows missing any column are dropped in one pass"""
+        df = self.create_test_dataframe()
+        df['price'] = 50000.0 + np.arange(100) % 10
+        df.loc[5, 'price'] = 5_000_000.0  # Far outside 3 standard deviations
+        df.loc[7, 'side'] = None
+        
+        cleaned_df = self.processor.clean_data(df, "binance", "btcusdt")
+        
+        assert len(cleaned_df) == 98
+        assert cleaned_df['price'].max() < 50010
+        assert cleaned_df['timestamp'].is_monotonic_increasing
+    
+    def test_row_mask(self):
+        """Test the fused row filter against the chained pandas filters"""
+        rng = np.random.default_rng(0)
+        price = rng.normal(50000, 50, 1000)
+        price[[3, 7]] = [-1.0, 1e6]
+        quantity = rng.uniform(-0.1, 1.0, 1000)
+        complete = rng.random(1000) > 0.05
+        
+        kept = (price > 0) & (quantity > 0) & complete
+        expected = kept & (np.abs(price - price[kept].mean()) <= 3 * price[kept].std(ddof=1))
+        
+        assert np.array_equal(_row_mask(price, quantity, complete), expected)
+    
+    def test_row_mask_numexpr_matches_numpy(self):
+        """Test that the numexpr and NumPy row filters agree"""
+        pytest.importorskip("numexpr")
+        rng = np.random.default_rng(1)
+        price = rng.normal(50000, 50, 1000)
+        price[[3, 7, 11]] = [-1.0, 1e6, np.nan]
+        quantity = rng.uniform(-0.1, 1.0, 1000)
+        complete = rng.random(1000) > 0.05
+        
+        fused = _row_mask(price, quantity, complete)
+        with patch('data_manipulation.data_processor.numexpr', None):
+            plain = _row_mask(price, quantity, complete)
+        
+        assert np.array_equal(fused, plain)
+    
+    def test_drop_duplicates(self):
+        """Test that only fully identical rows are dropped, in original order"""
+        df = self.create_test_dataframe()
+        df.loc[5, 'timestamp'] = df.loc[4, 'timestamp']  # Same time, different trade
+        df = self.append_copies(df, [20, 4]).sample(frac=1, random_state=0)
+        
+        pd.testing.assert_frame_equal(_drop_duplicates(df), df.drop_duplicates())
+        assert len(_drop_duplicates(df)) == 100
+    
+    def test_clean_counts(self):
+        """Test the row counts reported by the cleaning summary"""
+        df = self.create_test_dataframe()
+        df = self.append_copies(df, np.arange(3))  # 3 duplicates
+        df.loc[10, 'side'] = None  # 1 incomplete row
+        df.loc[[20, 21], 'quantity'] = 0.0  # 2 filtered rows
+        
+        _, summary = self.processor._clean(df, "binance", "btcusdt")
+        
+        assert (summary['duplicates'], summary['incomplete'], summary['filtered'], summary['records']) == (3, 1, 2, 97)
+    
     def test_clean_data_empty(self):
         """Test cleaning empty DataFrame"""
         df = pd.DataFrame()
@@ -90,17 +158,36 @@ class TestDataProcessor:
     def test_validate_data_invalid_price(self):
         """Test validation with invalid prices"""
         df = self.create_test_dataframe()
-        df.loc[0, 'price'] = -1000  # Negative price
+        df.iat[0, df.columns.get_loc('price')] = -1000  # Negative price
         result = self.processor.validate_data(df, "binance", "btcusdt")
         assert result is False
     
     def test_validate_data_high_price(self):
         """Test validation with suspiciously high prices"""
         df = self.create_test_dataframe()
-        df.loc[0, 'price'] = 2000000  # Too high
+        df.iat[0, df.columns.get_loc('price')] = 2000000  # Too high
+        result = self.processor.validate_data(df, "binance", "btcusdt")
+        assert result is False
+    
+    def test_validate_data_missing_price(self):
+        """Test validation rejects NaN prices in the same pass as the range check"""
+        df = self.create_test_dataframe()
+        df.iat[0, df.columns.get_loc('price')] = np.nan
         result = self.processor.validate_data(df, "binance", "btcusdt")
         assert result is False
     
+    def test_validate_data_uses_summary(self):
+        """Test that a cleaning summary replaces the column scans"""
+        df = self.create_test_dataframe()
+        cleaned, summary = self.processor._clean(df, "binance", "btcusdt")
+        
+        assert (summary['price_min'], summary['price_max']) == (cleaned['price'].min(), cleaned['price'].max())
+        assert (summary['time_min'], summary['time_max']) == (cleaned['timestamp'].min(), cleaned['timestamp'].max())
+        assert self.processor.validate_data(cleaned, "binance", "btcusdt", summary) is True
+        
+        summary['price_max'] = 2000000  # Validation trusts the summary
+        assert self.processor.validate_data(cleaned, "binance", "btcusdt", summary) is False
+    
     def test_synchronize_time(self):
         """Test time synchronization"""
         # Create test data with different time ranges
@@ -121,6 +208,14 @@ class TestDataProcessor:
         assert len(synchronized['btcusdt']) > 0
         assert len(synchronized['ethusdt']) > 0
     
+    def test_synchronize_time_no_copy(self):
+        """Test that synchronized frames share memory with their input"""
+        df = self.create_test_dataframe()
+        
+        synchronized = self.processor.synchronize_time({'btcusdt': df})
+        
+        assert np.shares_memory(synchronized['btcusdt']['price'].to_numpy(), df['price'].to_numpy())
+    
     def test_synchronize_time_empty(self):
         """Test synchronization with empty data"""
         synchronized = self.processor.synchronize_time({})
@@ -133,12 +228,61 @@ class TestDataProcessor:
         os.makedirs(exchange_dir, exist_ok=True)
         
         df = self.create_test_dataframe()
-        df.to_csv(os.path.join(exchange_dir, "btcusdt.csv"), index=False)
+        df.to_parquet(os.path.join(exchange_dir, "btcusdt.parquet"), index=False)
         
         result = self.processor.load_exchange_data("binance")
         
         assert "btcusdt" in result
         assert len(result["btcusdt"]) == 100
+        assert pd.api.types.is_datetime64_any_dtype(result["btcusdt"]["timestamp"])
+        assert result["btcusdt"]["price"].dtype == np.float64
+        assert isinstance(result["btcusdt"]["side"].dtype, pd.CategoricalDtype)
+        assert set(result["btcusdt"]["side"].cat.categories) == {"buy", "sell"}
+    
+    def test_load_exchange_data_csv(self):
+        """Test loading a legacy CSV download with typed columns"""
+        exchange_dir = os.path.join(self.temp_dir, "binance")
+        os.makedirs(exchange_dir, exist_ok=True)
+        
+        self.create_test_dataframe().to_csv(os.path.join(exchange_dir, "btcusdt.csv"), index=False)
+        
+        result = self.processor.load_exchange_data("binance")
+        
+        assert len(result["btcusdt"]) == 100
+        assert pd.api.types.is_datetime64_any_dtype(result["btcusdt"]["timestamp"])
+    
+    def test_load_exchange_data_prefers_parquet(self):
+        """Test that a Parquet download wins over a legacy CSV of the same symbol"""
+        exchange_dir = os.path.join(self.temp_dir, "binance")
+        os.makedirs(exchange_dir, exist_ok=True)
+        
+        df = self.create_test_dataframe()
+        df.head(10).to_csv(os.path.join(exchange_dir, "btcusdt.csv"), index=False)
+        df.to_parquet(os.path.join(exchange_dir, "btcusdt.parquet"), index=False)
+        
+        with patch.object(self.processor, '_read_raw_file', wraps=self.processor._read_raw_file) as mock_read:
+            result = self.processor.load_exchange_data("binance")
+        
+        assert len(result["btcusdt"]) == 100
+        mock_read.assert_called_once_with(os.path.join(exchange_dir, "btcusdt.parquet"))
+    
+    def test_load_exchange_data_streams_batches(self):
+        """Test that batched reading drops invalid rows and keeps clean_data's result"""
+        exchange_dir = os.path.join(self.temp_dir, "binance")
+        os.makedirs(exchange_dir, exist_ok=True)
+        
+        df = self.create_test_dataframe()
+        df.loc[[3, 40, 77], 'price'] = -1.0
+        df = self.append_copies(df, [10])  # Duplicate in another batch
+        df.to_parquet(os.path.join(exchange_dir, "btcusdt.parquet"), index=False)
+        self.processor.chunk_size = 30
+        
+        result = self.processor.load_exchange_data("binance")["btcusdt"]
+        
+        assert len(result) == 98
+        cleaned = self.processor.clean_data(result, "binance", "btcusdt")
+        expected = self.processor.clean_data(df, "binance", "btcusdt").astype(cleaned.dtypes.to_dict())
+        pd.testing.assert_frame_equal(cleaned.reset_index(drop=True), expected.reset_index(drop=True))
     
     def test_load_exchange_data_missing_dir(self):
         """Test loading from missing directory"""
@@ -152,13 +296,38 @@ class TestDataProcessor:
         
         self.processor._save_processed_data("binance", data)
         
-        expected_file = os.path.join(self.processor.processed_dir, "binance", "btcusdt.csv")
+        expected_file = os.path.join(self.processor.processed_dir, "binance", "btcusdt.parquet")
         assert os.path.exists(expected_file)
+        assert not os.path.exists(os.path.join(self.processor.processed_dir, "binance", "btcusdt.csv"))
         
         # Verify content
-        loaded_df = pd.read_csv(expected_file)
+        loaded_df = pd.read_parquet(expected_file)
         assert len(loaded_df) == 100
     
+    def test_save_processed_data_csv_copy(self):
+        """Test the optional CSV copy of processed data"""
+        df = self.create_test_dataframe()
+        self.processor.csv_copy = True
+        self.processor._save_processed_data("binance", {"btcusdt": df})
+        
+        exchange_dir = os.path.join(self.processor.processed_dir, "binance")
+        saved = pd.read_csv(os.path.join(exchange_dir, "btcusdt.csv"), parse_dates=['timestamp'])
+        assert len(saved) == 100
+        assert (saved['timestamp'].to_numpy() == df['timestamp'].to_numpy()).all()
+        np.testing.assert_allclose(saved['price'], df['price'])
+        assert len(pd.read_parquet(os.path.join(exchange_dir, "btcusdt.parquet"))) == 100
+    
+    def test_load_processed_data(self):
+        """Test reading processed data back with column pruning"""
+        self.processor._save_processed_data("binance", {"btcusdt": self.create_test_dataframe()})
+        
+        result = self.processor.load_processed_data("binance")
+        
+        assert list(result["btcusdt"].columns) == ['timestamp', 'price', 'quantity', 'side']
+        assert len(result["btcusdt"]) == 100
+        assert len(self.processor.load_processed_data("binance", columns=None)["btcusdt"].columns) == 6
+        assert self.processor.load_processed_data("nonexistent") == {}
+    
     def test_process_exchange(self):
         """Test processing single exchange"""
         # Create test data
@@ -166,18 +335,78 @@ class TestDataProcessor:
         os.makedirs(exchange_dir, exist_ok=True)
         
         df = self.create_test_dataframe()
-        df.to_csv(os.path.join(exchange_dir, "btcusdt.csv"), index=False)
+        df.to_parquet(os.path.join(exchange_dir, "btcusdt.parquet"), index=False)
         
         result = self.processor.process_exchange("binance")
         
         assert "btcusdt" in result
         assert len(result["btcusdt"]) > 0
     
+    def test_process_exchange_counts_rows_dropped_on_read(self):
+        """Test that rows dropped while streaming the raw file show up in the cleaning summary"""
+        exchange_dir = os.path.join(self.temp_dir, "binance")
+        os.makedirs(exchange_dir, exist_ok=True)
+        
+        df = self.append_copies(self.create_test_dataframe(), np.arange(2))  # 2 duplicates
+        price = df['price'].to_numpy(copy=True)
+        price[10] = np.nan  # 1 incomplete row
+        price[20] = -1.0  # 1 filtered row
+        df.assign(price=price).to_parquet(os.path.join(exchange_dir, "btcusdt.parquet"), index=False)
+        
+        with patch.object(self.processor, '_log_cleaning', wraps=self.processor._log_cleaning) as mock_log:
+            self.processor.process_exchange("binance")
+        
+        (summary,) = mock_log.call_args.args[1]
+        assert (summary['duplicates'], summary['incomplete'], summary['filtered'], summary['records']) == (2, 1, 1, 98)
+    
+    def test_process_exchange_drops_invalid_symbol(self):
+        """Test that one symbol failing validation does not affect the others"""
+        exchange_dir = os.path.join(self.temp_dir, "binance")
+        os.makedirs(exchange_dir, exist_ok=True)
+        
+        df = self.create_test_dataframe()
+        df.to_csv(os.path.join(exchange_dir, "btcusdt.csv"), index=False)
+        df.assign(price=df['price'] * 100).to_csv(os.path.join(exchange_dir, "ethusdt.csv"), index=False)
+        
+        result = self.processor.process_exchange("binance")
+        
+        assert list(result) == ["btcusdt"]
+    
     def test_process_exchange_no_data(self):
         """Test processing exchange with no data"""
         result = self.processor.process_exchange("nonexistent")
         assert result == {}
     
+    def test_process_file(self):
+        """Test processing a single downloaded file"""
+        exchange_dir = os.path.join(self.temp_dir, "coinbase")
+        os.makedirs(exchange_dir, exist_ok=True)
+        
+        filepath = os.path.join(exchange_dir, "btc_usd.parquet")
+        self.create_test_dataframe().to_parquet(filepath, index=False)
+        
+        result = self.processor.process_file(filepath)
+        
+        assert len(result) > 0
+        assert os.path.exists(os.path.join(self.processor.processed_dir, "coinbase", "btc_usd.parquet"))
+    
+    def test_process_file_csv_copy(self):
+        """Test that the csv_copy constructor option reaches the saved output"""
+        processor = DataProcessor(data_dir=self.temp_dir, csv_copy=True)
+        filepath = os.path.join(self.temp_dir, "coinbase", "btc_usd.parquet")
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self.create_test_dataframe().to_parquet(filepath, index=False)
+        
+        processor.process_file(filepath)
+        
+        exchange_dir = os.path.join(processor.processed_dir, "coinbase")
+        assert os.path.exists(os.path.join(exchange_dir, "btc_usd.parquet"))
+        assert len(pd.read_csv(os.path.join(exchange_dir, "btc_usd.csv"))) == 100
+    
+    def test_process_file_missing(self):
+        """Test processing a file that does not exist"""
+        assert self.processor.process_file(os.path.join(self.temp_dir, "binance", "missing.csv")) is None
+    
     def test_process_all_data(self):
         """Test processing all data"""
         # Create test data for all exchanges
@@ -194,3 +423,5 @@ class TestDataProcessor:
         for exchange in ["binance", "coinbase", "kraken"]:
             assert exchange in result
             assert "btcusdt" in result[exchange]
+            assert result[exchange]["btcusdt"] == 100
+            assert os.path.exists(os.path.join(self.processor.processed_dir, exchange, "btcusdt.parquet"))
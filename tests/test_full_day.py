@@ -6,14 +6,28 @@ import asyncio
 import sys
 import os
 
-# Add src to path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+import pytest
 
-from data.data_downloader import DataDownloader
-from data.data_processor import DataProcessor
+# Add src to path when run as a script; under pytest, tests/conftest.py already did
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_manipulation.data_downloader import DataDownloader
+from data_manipulation.data_processor import DataProcessor
 from analysis.arbitrage_detector import ArbitrageDetector
 from analysis.triangular_arbitrage import TriangularArbitrageDetector
 
+# Replays a full day from tardis.dev and writes under ./data, so it only runs on request
+pytestmark = [
+    pytest.mark.integration,
+    pytest.mark.io,
+    pytest.mark.asyncio,
+    pytest.mark.skipif(
+        not os.environ.get("RUN_INTEGRATION"),
+        reason="network replay of a full day; set RUN_INTEGRATION=1 to run"
+    ),
+]
+
 
 async def test_full_day_arbitrage():
     """Test arbitrage detection with full day data"""
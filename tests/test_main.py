@@ -5,13 +5,56 @@ Unit tests for main script
 import pytest
 import os
 import tempfile
-from unittest.mock import Mock, patch, AsyncMock
-import sys
+from unittest.mock import Mock, patch
 
-# Add src to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from main import validate_date, get_user_input, download_and_process_data, detect_arbitrage, save_opportunities
+from data_manipulation.data_downloader import DataDownloader
+from data_manipulation.data_processor import DataProcessor
+from analysis.arbitrage_detector import ArbitrageDetector
+from analysis.triangular_arbitrage import TriangularArbitrageDetector
 
-from main import validate_date, get_user_input, download_and_process_data, detect_arbitrage
+
+@pytest.fixture
+def mock_downloader():
+    """DataDownloader patched into main; spec_set keeps the mock to the real API"""
+    downloader = Mock(spec_set=DataDownloader)
+    with patch('main.DataDownloader', return_value=downloader):
+        yield downloader
+
+
+@pytest.fixture
+def mock_processor():
+    """DataProcessor patched into main; spec_set keeps the mock to the real API"""
+    processor = Mock(spec_set=DataProcessor)
+    with patch('main.DataProcessor', return_value=processor):
+        yield processor
+
+
+@pytest.fixture
+def mock_detector(tmp_path, monkeypatch):
+    """ArbitrageDetector patched into main, returning one symbol and no opportunities"""
+    detector = Mock(spec_set=ArbitrageDetector)
+    detector.load_processed_data.return_value = {"binance": {"btcusdt": "data"}}
+    detector.iter_arbitrage_opportunities.return_value = iter([])
+    detector.analyze_exchange_performance.return_value = {}
+    detector.generate_report.return_value = "Test Report"
+    # detect_arbitrage writes results/<date> relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    with patch('main.ArbitrageDetector', return_value=detector):
+        yield detector
+
+
+@pytest.fixture
+def mock_triangular_detector(tmp_path, monkeypatch):
+    """TriangularArbitrageDetector patched into main, returning one symbol and no opportunities"""
+    detector = Mock(spec_set=TriangularArbitrageDetector)
+    detector.load_processed_data.return_value = {"binance": {"btcusdt": "data"}}
+    detector.find_triangular_opportunities.return_value = []
+    detector.analyze_triangular_performance.return_value = {}
+    detector.generate_triangular_report.return_value = "Test Report"
+    monkeypatch.chdir(tmp_path)
+    with patch('main.TriangularArbitrageDetector', return_value=detector):
+        yield detector
 
 
 class TestMain:
@@ -35,6 +78,9 @@ class TestMain:
         assert validate_date("2025-02-01") is True   # February 1st
         assert validate_date("2025-03-01") is True   # March 1st
         assert validate_date("2024-02-01") is True   # Leap year
+        assert validate_date("2025-10-1") is True    # Unpadded day, as strptime accepts
+        assert validate_date("2025-10-11") is False  # Ends in 1 but is not the 1st
+        assert validate_date("2025-10-") is False    # Missing day
     
     @patch('builtins.input')
     def test_get_user_input_valid(self, mock_input):
@@ -92,112 +138,95 @@ class TestMain:
         assert arbitrage_type == 1
     
     @pytest.mark.asyncio
-    async def test_download_and_process_data_success(self):
+    async def test_download_and_process_data_success(self, mock_downloader, mock_processor):
         """Test successful data download and processing"""
-        with patch('main.DataDownloader') as mock_downloader_class, \
-             patch('main.DataProcessor') as mock_processor_class:
-            
-            # Mock downloader
-            mock_downloader = Mock()
-            mock_downloader.download_all_data = AsyncMock(return_value=["file1.csv", "file2.csv"])
-            mock_downloader_class.return_value = mock_downloader
-            
-            # Mock processor
-            mock_processor = Mock()
-            mock_processor.process_all_data.return_value = {"binance": {"btcusdt": "data"}}
-            mock_processor_class.return_value = mock_processor
-            
-            result = await download_and_process_data("2025-10-01")
-            
-            assert result is True
-            mock_downloader.download_all_data.assert_called_once()
-            mock_processor.process_all_data.assert_called_once()
+        # Mock downloader that hands each file to the processing queue
+        async def download_all_data(duration_minutes, queue):
+            for filename in ["file1.csv", "file2.csv"]:
+                await queue.put(filename)
+            return ["file1.csv", "file2.csv"]
+        
+        mock_downloader.download_all_data.side_effect = download_all_data
+        mock_processor.process_file.return_value = "data"
+        
+        result = await download_and_process_data("2025-10-01")
+        
+        assert result is True
+        mock_downloader.download_all_data.assert_called_once()
+        assert mock_processor.process_file.call_count == 2
     
     @pytest.mark.asyncio
-    async def test_download_and_process_data_failure(self):
+    async def test_download_and_process_data_failure(self, mock_downloader, mock_processor):
         """Test failed data download and processing"""
-        with patch('main.DataDownloader') as mock_downloader_class:
-            # Mock downloader failure
-            mock_downloader = Mock()
-            mock_downloader.download_all_data.return_value = []
-            mock_downloader_class.return_value = mock_downloader
-            
-            result = await download_and_process_data("2025-10-01")
-            
-            assert result is False
+        # Mock downloader failure
+        mock_downloader.download_all_data.return_value = []
+        
+        result = await download_and_process_data("2025-10-01")
+        
+        assert result is False
     
     @pytest.mark.asyncio
-    async def test_download_and_process_data_exception(self):
+    async def test_download_and_process_data_exception(self, mock_downloader, mock_processor):
         """Test data download and processing with exception"""
-        with patch('main.DataDownloader') as mock_downloader_class:
-            # Mock downloader exception
-            mock_downloader = Mock()
-            mock_downloader.download_all_data.side_effect = Exception("API Error")
-            mock_downloader_class.return_value = mock_downloader
-            
-            result = await download_and_process_data("2025-10-01")
-            
-            assert result is False
+        # Mock downloader exception
+        mock_downloader.download_all_data.side_effect = Exception("API Error")
+        
+        result = await download_and_process_data("2025-10-01")
+        
+        assert result is False
     
-    def test_detect_arbitrage_regular(self):
+    def test_detect_arbitrage_regular(self, mock_detector):
         """Test regular arbitrage detection"""
-        with patch('main.ArbitrageDetector') as mock_detector_class:
-            # Mock detector
-            mock_detector = Mock()
-            mock_detector.load_processed_data.return_value = {"binance": {"btcusdt": "data"}}
-            mock_detector.find_arbitrage_opportunities.return_value = []
-            mock_detector.analyze_exchange_performance.return_value = {}
-            mock_detector.generate_report.return_value = "Test Report"
-            mock_detector_class.return_value = mock_detector
-            
-            result = detect_arbitrage("2025-10-01", 0.3, 1)
+        result = detect_arbitrage("2025-10-01", 0.3, 1)
+        
+        assert result is True
+        mock_detector.load_processed_data.assert_called_once()
+        mock_detector.iter_arbitrage_opportunities.assert_called_once()
+        mock_detector.generate_report.assert_called_once_with([], {}, total_opportunities=0)
+    
+    @pytest.mark.io
+    def test_save_opportunities(self):
+        """Test streaming opportunities to Parquet in batches"""
+        import pandas as pd
+        
+        opportunities = (
+            {"buy_exchange": "binance", "sell_exchange": "coinbase", "risk_adjusted_percentage": float(i)}
+            for i in range(25)
+        )
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "opportunities.parquet")
+            total, top = save_opportunities(opportunities, path, chunk_size=10, top_n=3)
             
-            assert result is True
-            mock_detector.load_processed_data.assert_called_once()
-            mock_detector.find_arbitrage_opportunities.assert_called_once()
+            assert total == 25
+            assert [opp["risk_adjusted_percentage"] for opp in top] == [24.0, 23.0, 22.0]
+            assert len(pd.read_parquet(path)) == 25
     
-    def test_detect_arbitrage_triangular(self):
+    def test_detect_arbitrage_triangular(self, mock_triangular_detector):
         """Test triangular arbitrage detection"""
-        with patch('main.TriangularArbitrageDetector') as mock_detector_class:
-            # Mock detector
-            mock_detector = Mock()
-            mock_detector.load_processed_data.return_value = {"binance": {"btcusdt": "data"}}
-            mock_detector.find_triangular_opportunities.return_value = []
-            mock_detector.analyze_triangular_performance.return_value = {}
-            mock_detector.generate_triangular_report.return_value = "Test Report"
-            mock_detector_class.return_value = mock_detector
-            
-            result = detect_arbitrage("2025-10-01", 0.3, 2)
-            
-            assert result is True
-            mock_detector.load_processed_data.assert_called_once()
-            mock_detector.find_triangular_opportunities.assert_called_once()
+        result = detect_arbitrage("2025-10-01", 0.3, 2)
+        
+        assert result is True
+        mock_triangular_detector.load_processed_data.assert_called_once()
+        mock_triangular_detector.find_triangular_opportunities.assert_called_once()
     
     def test_detect_arbitrage_invalid_type(self):
         """Test arbitrage detection with invalid type"""
         result = detect_arbitrage("2025-10-01", 0.3, 3)
         assert result is False
     
-    def test_detect_arbitrage_no_data(self):
+    def test_detect_arbitrage_no_data(self, mock_detector):
         """Test arbitrage detection with no data"""
-        with patch('main.ArbitrageDetector') as mock_detector_class:
-            # Mock detector with no data
-            mock_detector = Mock()
-            mock_detector.load_processed_data.return_value = {}
-            mock_detector_class.return_value = mock_detector
-            
-            result = detect_arbitrage("2025-10-01", 0.3, 1)
-            
-            assert result is False
+        mock_detector.load_processed_data.return_value = {}
+        
+        result = detect_arbitrage("2025-10-01", 0.3, 1)
+        
+        assert result is False
     
-    def test_detect_arbitrage_exception(self):
+    def test_detect_arbitrage_exception(self, mock_detector):
         """Test arbitrage detection with exception"""
-        with patch('main.ArbitrageDetector') as mock_detector_class:
-            # Mock detector with exception
-            mock_detector = Mock()
-            mock_detector.load_processed_data.side_effect = Exception("Data Error")
-            mock_detector_class.return_value = mock_detector
-            
-            result = detect_arbitrage("2025-10-01", 0.3, 1)
-            
-            assert result is False
+        mock_detector.load_processed_data.side_effect = Exception("Data Error")
+        
+        result = detect_arbitrage("2025-10-01", 0.3, 1)
+        
+        assert result is False